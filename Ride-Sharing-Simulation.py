@@ -1,3 +1,1224 @@
+"""Benchmarks for the simulation engine.
+Run this module to compare the event queue backends at several queue
+depths, the ways of finding the nearest driver at several fleet sizes,
+and greedy and batched dispatch on the sample events.
+Run it as "python benchmark.py suite [baseline.json]" to run the
+benchmark suite on the standard scenarios instead. If the baseline file
+exists, the results are compared with it and regressions are listed;
+otherwise the results are saved to it.
+=== Constants ===
+@type SCENARIOS: dict[str, dict[str, int] | None]
+The standard scenarios of the benchmark suite: the number of drivers
+and riders of each synthetic city, or None for the sample events.
+@type HIGHER_IS_BETTER: tuple[str]
+The measurements in suite results that are better when higher.
+@type LOWER_IS_BETTER: tuple[str]
+The measurements in suite results that are better when lower. Other
+measurements, such as the number of events, are not compared.
+"""
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from time import perf_counter
+from container import PriorityQueue, CalendarQueue
+from dispatcher import Dispatcher, DriverGrid, DriverArray
+from driver import Driver
+from event import Event, create_event_list
+from location import Location
+from monitor import AggregateMonitor
+from rider import Rider
+from simulation import Simulation
+from workload import stream_events, write_events
+try:
+import resource
+except ImportError:
+resource = None
+SCENARIOS = {
+"tiny": None,
+"city-10k": {"num_drivers": 200, "num_riders": 10000},
+"city-100k": {"num_drivers": 2000, "num_riders": 100000},
+"city-1m": {"num_drivers": 20000, "num_riders": 1000000},
+"backlog": {"num_drivers": 20, "num_riders": 20000},
+"surplus": {"num_drivers": 5000, "num_riders": 5000},
+}
+HIGHER_IS_BETTER = ("events_per_second",)
+LOWER_IS_BETTER = ("seconds", "parse_seconds", "queue_seconds",
+"dispatcher_seconds", "monitor_seconds", "other_seconds",
+"peak_rss_kb")
+def benchmark_queue(queue_class, depth, operations=100000, horizon=100,
+seed=0):
+"""Return the average time in seconds of one remove and one add on a
+queue of <queue_class> holding <depth> events.
+Each removed event is replaced by an event up to <horizon> time units
+after it, which is how the simulation schedules new events.
+@type queue_class: type
+@type depth: int
+@type operations: int
+@type horizon: int
+@type seed: int
+@rtype: float
+"""
+rng = Random(seed)
+queue = queue_class()
+queue.add_all([Event(rng.randint(0, horizon)) for _ in range(depth)])
+increments = [rng.randint(0, horizon) for _ in range(operations)]
+start = perf_counter()
+for increment in increments:
+event = queue.remove()
+queue.add(Event(event.timestamp + increment))
+return (perf_counter() - start) / operations
+def compare_queues(depths=(10, 100, 1000, 10000, 100000)):
+"""Print the time per operation of each queue backend at each
+depth, and which backend wins.
+@type depths: tuple[int]
+@rtype: None
+"""
+print("{:>8} {:>14} {:>14}  {}".format("depth", "PriorityQueue",
+"CalendarQueue", "winner"))
+for depth in depths:
+heap_time = benchmark_queue(PriorityQueue, depth)
+calendar_time = benchmark_queue(CalendarQueue, depth)
+if heap_time <= calendar_time:
+winner = "PriorityQueue"
+else:
+winner = "CalendarQueue"
+print("{:>8} {:>12.2f}us {:>12.2f}us  {}".format(
+depth, heap_time * 1e6, calendar_time * 1e6, winner))
+def nearest_by_loop(drivers, location):
+"""Return the driver in <drivers> with the shortest travel time to
+<location>, or None if <drivers> is empty, by comparing them one at a
+time.
+This is how Dispatcher.request_driver used to search, and ties are
+resolved the same way, in favour of the last driver.
+@type drivers: list[Driver]
+@type location: Location
+@rtype: Driver | None
+"""
+fastest_driver = None
+fastest_time = 0
+for driver in drivers:
+time = driver.get_travel_time(location)
+if fastest_driver is None or time <= fastest_time:
+fastest_driver = driver
+fastest_time = time
+return fastest_driver
+def benchmark_nearest(index_class, num_drivers, queries=100, size=1000,
+seed=0):
+"""Return the average time in seconds of one nearest driver search
+among <num_drivers> drivers spread over a <size> by <size> grid.
+<index_class> is DriverGrid, DriverArray, or None for
+nearest_by_loop over a list.
+@type index_class: type | None
+@type num_drivers: int
+@type queries: int
+@type size: int
+@type seed: int
+@rtype: float
+"""
+rng = Random(seed)
+drivers = [Driver(str(i), Location(rng.randrange(size),
+rng.randrange(size)),
+rng.randint(1, 5))
+for i in range(num_drivers)]
+locations = [Location(rng.randrange(size), rng.randrange(size))
+for _ in range(queries)]
+if index_class is None:
+start = perf_counter()
+for location in locations:
+nearest_by_loop(drivers, location)
+else:
+index = index_class()
+for driver in drivers:
+index.add(driver)
+start = perf_counter()
+for location in locations:
+index.nearest(location)
+return (perf_counter() - start) / queries
+def compare_indexes(sizes=(10, 100, 1000, 10000, 100000, 1000000)):
+"""Print the time per nearest driver search of the loop, DriverArray
+and DriverGrid at each fleet size.
+@type sizes: tuple[int]
+@rtype: None
+"""
+print("{:>8} {:>14} {:>14} {:>14}".format("drivers", "loop",
+"DriverArray", "DriverGrid"))
+for size in sizes:
+queries = max(10, min(1000, 1000000 // size))
+times = [benchmark_nearest(index_class, size, queries)
+for index_class in (None, DriverArray, DriverGrid)]
+print("{:>8} {:>12.2f}us {:>12.2f}us {:>12.2f}us".format(
+size, *[time * 1e6 for time in times]))
+def benchmark_matching(num_riders, num_drivers, candidates=16, size=100,
+seed=0):
+"""Return the time in seconds to match a batch of <num_riders> riders
+to <num_drivers> drivers spread over a <size> by <size> grid, and the
+number of riders matched.
+@type num_riders: int
+@type num_drivers: int
+@type candidates: int
+@type size: int
+@type seed: int
+@rtype: (float, int)
+"""
+rng = Random(seed)
+dispatcher = Dispatcher(window=1, candidates=candidates)
+dispatcher.available_drivers = [
+Driver(str(i), Location(rng.randrange(size), rng.randrange(size)),
+rng.randint(1, 5))
+for i in range(num_drivers)]
+for i in range(num_riders):
+dispatcher.add_to_batch(Rider(str(i), Location(rng.randrange(size),
+rng.randrange(size)),
+Location(0, 0), 1))
+start = perf_counter()
+pairs = dispatcher.match_batch()
+return perf_counter() - start, len(pairs)
+def compare_dispatch(filename="events.txt", windows=(0, 1, 2, 5, 10)):
+"""Print the running time, the mean rider wait time and the mean
+distance driven by each driver, in grid blocks, of a simulation of the
+events in <filename> with each batching window, where a window of 0 is
+greedy dispatch.
+@type filename: str
+@type windows: tuple[int]
+@rtype: None
+"""
+print("{:>8} {:>10} {:>10} {:>10}".format("window", "time",
+"mean wait", "mean dist"))
+for window in windows:
+events = create_event_list(filename)
+start = perf_counter()
+report = Simulation(window=window).run(events)
+print("{:>8} {:>9.3f}s {:>10.3f} {:>10.3f}".format(
+window, perf_counter() - start, report["rider_wait_time"],
+report["driver_total_distance"]))
+class _Timed:
+"""A wrapper around an object that adds the time spent in each call
+of its methods to a total.
+"""
+# === Private Attributes ===
+# @type _target: object
+# The wrapped object.
+# @type _totals: dict[str, float]
+# The totals, by name.
+# @type _name: str
+# The name of the total of this object.
+# @type _calls: dict[str, int]
+# The number of calls of each method, by name.
+def __init__(self, target, totals, name):
+"""Initialize a _Timed wrapper of <target>.
+@type self: _Timed
+@type target: object
+@type totals: dict[str, float]
+@type name: str
+@rtype: None
+"""
+self._target = target
+self._totals = totals
+self._name = name
+self._calls = {}
+totals[name] = 0.0
+def __getattr__(self, attribute):
+"""Return the attribute of the wrapped object, timing and counting
+each call of it if it is a method.
+@type self: _Timed
+@type attribute: str
+@rtype: object
+>>> queue = _Timed(PriorityQueue(), {}, "queue_seconds")
+>>> add, remove = queue.add, queue.remove
+>>> add(Event(1))
+>>> queue.is_empty()
+False
+>>> queue._calls
+{'add': 1, 'is_empty': 1}
+"""
+value = getattr(self._target, attribute)
+if not callable(value):
+return value
+calls = self._calls
+def timed(*args, **kwargs):
+calls[attribute] = calls.get(attribute, 0) + 1
+start = perf_counter()
+try:
+return value(*args, **kwargs)
+finally:
+self._totals[self._name] += perf_counter() - start
+return timed
+def scenario_events(name, seed=0):
+"""Return an iterator over the events of the standard scenario
+<name>, generated with <seed>.
+Riders arrive at a steady 10 per time unit in a 100 by 100 city.
+@type name: str
+@type seed: int
+@rtype: iterator[Event]
+"""
+scenario = SCENARIOS[name]
+if scenario is None:
+return iter(create_event_list("events.txt"))
+return stream_events(Random(seed), scenario["num_drivers"],
+scenario["num_riders"] // 10, 10.0, demand=(1,))
+def benchmark_scenario(name, **options):
+"""Run the standard scenario <name> and return its measurements.
+The scenario is written to a text file and parsed, then run once for
+its throughput and once more with the event queue, the dispatcher and
+the monitor wrapped to time them; "other_seconds" is the time spent in
+the events themselves. <options> are passed to the Simulation, which
+uses an AggregateMonitor unless they say otherwise. Peak memory is the
+peak resident set size of the process, in kilobytes, or None where it
+cannot be measured.
+@type name: str
+@rtype: dict[str, float]
+"""
+options.setdefault("monitor_class", AggregateMonitor)
+with tempfile.TemporaryDirectory() as directory:
+filename = os.path.join(directory, "events.txt")
+write_events(scenario_events(name), filename)
+start = perf_counter()
+events = create_event_list(filename)
+parse_seconds = perf_counter() - start
+start = perf_counter()
+Simulation(**options).run(events)
+seconds = perf_counter() - start
+simulation = Simulation(**options)
+totals = {}
+# The components are replaced by timed wrappers of themselves.
+queue = _Timed(simulation._events, totals, "queue_seconds")
+simulation._events = queue
+simulation._dispatcher = _Timed(simulation._dispatcher, totals,
+"dispatcher_seconds")
+simulation._monitor = _Timed(simulation._monitor, totals,
+"monitor_seconds")
+start = perf_counter()
+simulation.run(create_event_list(filename))
+timed_seconds = perf_counter() - start
+num_events = queue._calls.get("remove", 0)
+results = {"events": num_events, "seconds": seconds,
+"events_per_second": num_events / seconds,
+"parse_seconds": parse_seconds}
+results.update(totals)
+results["other_seconds"] = timed_seconds - sum(totals.values())
+if resource is None:
+results["peak_rss_kb"] = None
+else:
+results["peak_rss_kb"] = \
+resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+return results
+def run_suite(names=None, **options):
+"""Run each of the standard scenarios in <names>, or all of them, in a
+process of its own, and return the measurements by scenario.
+<options> are passed to benchmark_scenario.
+@type names: list[str] | None
+@rtype: dict[str, dict[str, float]]
+"""
+if names is None:
+names = list(SCENARIOS)
+if "fork" in multiprocessing.get_all_start_methods():
+context = multiprocessing.get_context("fork")
+else:
+context = None
+results = {}
+for name in names:
+# A new process for each scenario, so its peak memory is its own.
+with ProcessPoolExecutor(1, mp_context=context) as executor:
+results[name] = executor.submit(benchmark_scenario, name,
+**options).result()
+return results
+def save_baseline(results, filename):
+"""Save the suite <results> to <filename> as a JSON baseline.
+@type results: dict[str, dict[str, float]]
+@type filename: str
+@rtype: None
+"""
+with open(filename, "w") as file:
+json.dump(results, file, indent=2, sort_keys=True)
+def find_regressions(results, baseline, threshold=0.1):
+"""Return the measurements in <results> that are worse than in
+<baseline> by more than <threshold>, as a fraction of the baseline.
+Only the measurements of time and memory, in HIGHER_IS_BETTER and
+LOWER_IS_BETTER, are compared. Each regression is (scenario,
+measurement, baseline value, value). Scenarios or measurements missing
+from either side are ignored.
+@type results: dict[str, dict[str, float]]
+@type baseline: dict[str, dict[str, float]]
+@type threshold: float
+@rtype: list[(str, str, float, float)]
+>>> find_regressions({"tiny": {"seconds": 1.5, "events": 40}},
+...                  {"tiny": {"seconds": 1.0, "events": 40}})
+[('tiny', 'seconds', 1.0, 1.5)]
+>>> find_regressions({"tiny": {"seconds": 1.0, "events": 80}},
+...                  {"tiny": {"seconds": 1.0, "events": 40}})
+[]
+>>> find_regressions({"tiny": {"events_per_second": 80.0}},
+...                  {"tiny": {"events_per_second": 100.0}})
+[('tiny', 'events_per_second', 100.0, 80.0)]
+"""
+regressions = []
+for name, measurements in results.items():
+for key, value in measurements.items():
+old = baseline.get(name, {}).get(key)
+if old is None or value is None or old == 0:
+continue
+if key in HIGHER_IS_BETTER:
+change = (old - value) / old
+elif key in LOWER_IS_BETTER:
+change = (value - old) / old
+else:
+continue
+if change > threshold:
+regressions.append((name, key, old, value))
+return regressions
+def compare_with_baseline(results, filename, threshold=0.1):
+"""Compare the suite <results> with the JSON baseline in <filename>,
+and return the regressions, as described in find_regressions.
+@type results: dict[str, dict[str, float]]
+@type filename: str
+@type threshold: float
+@rtype: list[(str, str, float, float)]
+"""
+with open(filename) as file:
+baseline = json.load(file)
+return find_regressions(results, baseline, threshold)
+if __name__ == "__main__":
+if len(sys.argv) > 1 and sys.argv[1] == "suite":
+suite_results = run_suite()
+print(json.dumps(suite_results, indent=2, sort_keys=True))
+if len(sys.argv) > 2:
+if os.path.exists(sys.argv[2]):
+for regression in compare_with_baseline(suite_results,
+sys.argv[2]):
+print("REGRESSION {}: {} {} -> {}".format(*regression))
+else:
+save_baseline(suite_results, sys.argv[2])
+else:
+compare_queues()
+compare_indexes()
+compare_dispatch()
+"""What-if branching
+A branch run simulates a scenario up to a branch point once, and then
+explores variants of it from there: each branch applies a perturbation to
+the warmed-up simulation, such as injecting events or changing the
+parameters of the dispatcher, and runs it to the end.
+Where processes can be forked, each branch runs in a child process forked
+from the warmed-up simulation, so it shares the state of the simulation
+copy-on-write instead of repeating the prefix. Elsewhere, the branches run
+one after another in this process, each on a deep copy of the state.
+The initial events after the branch point are never read into memory:
+each branch opens the initial events again, skips the ones the prefix has
+taken, and streams the rest, as a simulation does when it resumes from a
+checkpoint.
+"""
+import copy
+import multiprocessing
+from functools import partial
+from heapq import merge
+from itertools import islice
+from driver import Driver
+from location import Location
+from event import DriverRequest, RiderRequest, create_event_list
+from monitor import AggregateMonitor
+from simulation import Simulation
+# The branch time, the warmed-up simulation, the function that opens the
+# initial events and the perturbations of the branch run in this process,
+# set by run_branches.
+_branch_point = None
+class Branch:
+"""A warmed-up simulation at a branch point, as it is given to the
+perturbation of a branch.
+=== Attributes ===
+@type name: str
+The name of the branch.
+@type time: int
+The time of the branch point. Every event before it has been done,
+and none at or after it.
+@type dispatcher: Dispatcher
+The dispatcher of the simulation, whose parameters can be changed
+with its configure method.
+@type monitor: Monitor
+The monitor of the simulation.
+"""
+# === Private Attributes ===
+# @type _simulation: Simulation
+# The warmed-up simulation.
+# @type _events: iterator[Event]
+# The initial events that have not been taken yet, in order.
+def __init__(self, name, time, simulation, events):
+"""Initialize a Branch of <simulation> at <time>, with the initial
+events <events> still to take.
+@type self: Branch
+@type name: str
+@type time: int
+@type simulation: Simulation
+@type events: iterator[Event]
+@rtype: None
+"""
+self.name = name
+self.time = time
+self.dispatcher = simulation._dispatcher
+self.monitor = simulation._monitor
+self._simulation = simulation
+self._events = events
+def schedule(self, event):
+"""Add <event> to the event queue of the simulation.
+Precondition: event.timestamp >= self.time.
+@type self: Branch
+@type event: Event
+@rtype: None
+"""
+event.handle = self._simulation._events.schedule(event)
+def add_events(self, events):
+"""Merge <events> into the initial events that have not been taken
+yet.
+The events are taken from <events> as the simulation reaches them,
+so it can be an iterator over any number of them. Events with the
+same timestamp as an initial event are taken after it.
+Precondition: <events> are sorted by timestamp, and none of them is
+before self.time.
+@type self: Branch
+@type events: list[Event] | iterator[Event]
+@rtype: None
+"""
+self._events = merge(self._events, events,
+key=lambda event: event.timestamp)
+def map_events(self, function):
+"""Replace each initial event that has not been taken yet with
+function(event), or drop it if that is None.
+<function> is called on each event as the simulation reaches it.
+Precondition: the events returned by <function> are still sorted by
+timestamp, and none of them is before self.time.
+@type self: Branch
+@type function: callable
+@rtype: None
+"""
+self._events = (event for event in map(function, self._events)
+if event is not None)
+def run_branches(initial_events, time, perturbations, workers=None,
+**options):
+"""Run the simulation on <initial_events> up to <time>, then run one
+branch from there for each perturbation in <perturbations>, and return
+the report of each branch.
+<perturbations> maps the name of each branch to a function that is
+called with its Branch before it is run, or to None to run it
+unchanged. <options> are passed to the Simulation, and cannot include
+compact.
+Every branch needs its own pass over the initial events after the
+branch point, so <initial_events> is either a list or a function that
+returns the same events each time it is called, such as
+lambda: read_events(filename). The events are taken one at a time, so
+those returned by the function must be sorted by timestamp.
+@type initial_events: list[Event] | callable
+@type time: int
+@type perturbations: dict[str, callable | None]
+@type workers: int | None
+The number of processes, or None for one per processor.
+@rtype: dict[str, dict[str, object]]
+>>> def batch(branch):
+...     branch.dispatcher.configure(window=2)
+>>> reports = run_branches(create_event_list("events.txt"), 3,
+...                        {"unchanged": None, "batched": batch},
+...                        monitor_class=AggregateMonitor)
+>>> reports["unchanged"] == Simulation(
+...     monitor_class=AggregateMonitor).run(
+...     create_event_list("events.txt"))
+True
+>>> run_branches(iter(create_event_list("events.txt")), 3, {})
+Traceback (most recent call last):
+...
+ValueError: initial events must be a list or a function
+"""
+global _branch_point
+if options.get("compact"):
+raise ValueError("branches cannot be run with compact")
+if isinstance(initial_events, list):
+initial_events = partial(iter, sorted(initial_events))
+elif not callable(initial_events):
+raise ValueError("initial events must be a list or a function")
+simulation = Simulation(**options)
+simulation._start(iter(initial_events()))
+simulation._advance(time)
+# The branches open the initial events again, so the iterator of the
+# prefix is not shared with them.
+simulation._incoming = iter([])
+simulation._next_event = None
+names = list(perturbations)
+_branch_point = (time, simulation, initial_events, perturbations)
+try:
+if "fork" in multiprocessing.get_all_start_methods():
+# Every branch gets a new child, forked from this process at
+# the branch point, rather than a worker that has run another.
+context = multiprocessing.get_context("fork")
+with context.Pool(workers, maxtasksperchild=1) as pool:
+reports = pool.map(_run_branch, names, chunksize=1)
+else:
+reports = [_run_from(name, *copy.deepcopy(_branch_point))
+for name in names]
+finally:
+_branch_point = None
+return dict(zip(names, reports))
+def _run_branch(name):
+"""Run the branch <name> from the branch point of this process, and
+return its report.
+@type name: str
+@rtype: dict[str, object]
+"""
+return _run_from(name, *_branch_point)
+def _run_from(name, time, simulation, initial_events, perturbations):
+"""Apply the perturbation of the branch <name> to <simulation>, which
+is at the branch point <time>, run it to the end on the initial events
+it has not taken yet, and return its report.
+@type name: str
+@type time: int
+@type simulation: Simulation
+@type initial_events: callable
+@type perturbations: dict[str, callable | None]
+@rtype: dict[str, object]
+"""
+events = islice(iter(initial_events()), simulation._consumed, None)
+branch = Branch(name, time, simulation, events)
+if perturbations[name] is not None:
+perturbations[name](branch)
+simulation._incoming = iter(branch._events)
+simulation._next_event = next(simulation._incoming, None)
+simulation._advance()
+return simulation._report()
+if __name__ == "__main__":
+from workload import seeded_stream, generate_events
+def add_drivers(branch):
+branch.add_events(DriverRequest(branch.time, Driver(
+"Extra{}".format(i), Location(3 * i, 3 * i), 2))
+for i in range(10))
+def halve_patience(branch):
+def halve(event):
+if isinstance(event, RiderRequest):
+event.rider.patience = max(event.rider.patience // 2, 1)
+return event
+branch.map_events(halve)
+def batch(branch):
+branch.dispatcher.configure(window=3)
+reports = run_branches(
+generate_events(seeded_stream(0, 0), num_riders=2000), 500,
+{"baseline": None, "more drivers": add_drivers,
+"impatient": halve_patience, "batched": batch},
+monitor_class=AggregateMonitor)
+for name, report in reports.items():
+print(name, report)
+"""Checkpoints
+A checkpoint is a snapshot of a running simulation in a binary file: the
+events in the queue, the state of the dispatcher, the drivers and riders
+and the records of the monitor. A Simulation can save checkpoints at
+regular intervals of simulation time with a Checkpointer, and resume from
+one instead of starting over.
+Each table of the snapshot is stored column by column, with every column
+written as one array of machine numbers, so saving and loading take one
+pass over the objects rather than a pickle of each one. Drivers, riders
+and events are written once, in tables at the start of the file, and are
+referred to everywhere else by their index.
+=== Constants ===
+@type MAGIC: bytes
+The bytes at the start of every checkpoint file.
+@type VERSION: int
+The version of the checkpoint format.
+@type STATUSES: tuple[str]
+The rider statuses, in the order of their codes in a checkpoint.
+@type EVENT_CLASSES: tuple[type]
+The event classes, in the order of their codes in a checkpoint.
+"""
+import os
+import struct
+import sys
+from array import array
+from io import BytesIO
+from driver import Driver
+from rider import Rider, WAITING, CANCELLED, SATISFIED
+from location import Location
+from event import RiderRequest, DriverRequest, Cancellation, Pickup, \
+Dropoff, MatchBatch, make_event
+MAGIC = b"RSCK"
+VERSION = 2
+STATUSES = (WAITING, CANCELLED, SATISFIED)
+EVENT_CLASSES = (Dropoff, DriverRequest, RiderRequest, Cancellation, Pickup,
+MatchBatch)
+# The magic bytes, the version and whether the arrays are little endian.
+_HEADER = struct.Struct("<4sHB")
+# The typecode and length of an array.
+_ARRAY = struct.Struct("<cQ")
+# The number of strings and the length of their encoding.
+_STRINGS = struct.Struct("<QQ")
+class CheckpointWriter:
+"""An encoder of the state of a simulation.
+The state is written as a sequence of arrays, which a
+CheckpointReader reads back in the same order. Drivers, riders and
+events are numbered as they are first written, and stored in tables
+by dump().
+"""
+# === Private Attributes ===
+# @type _body: BytesIO
+# The arrays written so far.
+# @type _riders: list[Rider]
+# The riders that have been written, by index.
+# @type _rider_indices: dict[str, int]
+# The index of each rider that has been written, by id.
+# @type _drivers: list[Driver]
+# The drivers that have been written, by index.
+# @type _driver_indices: dict[str, int]
+# The index of each driver that has been written, by id.
+# @type _events: list[Event]
+# The events that have been written, by index.
+# @type _event_indices: dict[int, int]
+# The index of each event that has been written, by object id.
+def __init__(self):
+"""Initialize a CheckpointWriter that has written nothing.
+@type self: CheckpointWriter
+@rtype: None
+"""
+self._body = BytesIO()
+self._riders = []
+self._rider_indices = {}
+self._drivers = []
+self._driver_indices = {}
+self._events = []
+self._event_indices = {}
+def write_array(self, values):
+"""Write the array <values>.
+@type self: CheckpointWriter
+@type values: array
+@rtype: None
+"""
+self._body.write(_ARRAY.pack(values.typecode.encode(), len(values)))
+self._body.write(values.tobytes())
+def write_ints(self, values, typecode="q"):
+"""Write the integers in <values>, as an array of <typecode>.
+@type self: CheckpointWriter
+@type values: iterable[int]
+@type typecode: str
+@rtype: None
+"""
+self.write_array(array(typecode, values))
+def write_strings(self, strings):
+"""Write the strings in <strings>, which must not contain null
+characters.
+@type self: CheckpointWriter
+@type strings: list[str]
+@rtype: None
+"""
+encoded = "\0".join(strings).encode("utf-8")
+self._body.write(_STRINGS.pack(len(strings), len(encoded)))
+self._body.write(encoded)
+def write_locations(self, locations):
+"""Write the locations in <locations>, any of which may be None.
+@type self: CheckpointWriter
+@type locations: list[Location | None]
+@rtype: None
+"""
+self.write_ints(-1 if location is None else location.row
+for location in locations)
+self.write_ints(-1 if location is None else location.column
+for location in locations)
+def write_riders(self, riders):
+"""Write references to the riders in <riders>, any of which may be
+None.
+@type self: CheckpointWriter
+@type riders: iterable[Rider | None]
+@rtype: None
+"""
+self.write_ints(self._rider_index(rider) for rider in riders)
+def write_drivers(self, drivers):
+"""Write references to the drivers in <drivers>, any of which may
+be None.
+@type self: CheckpointWriter
+@type drivers: iterable[Driver | None]
+@rtype: None
+"""
+self.write_ints(self._driver_index(driver) for driver in drivers)
+def write_events(self, events):
+"""Write references to the events in <events>.
+@type self: CheckpointWriter
+@type events: iterable[Event]
+@rtype: None
+"""
+self.write_ints(self._event_index(event) for event in events)
+def dump(self, file):
+"""Write the header, the tables of drivers, riders and events, and
+then every array written so far, to the binary <file>.
+@type self: CheckpointWriter
+@type file: file
+@rtype: None
+"""
+body = self._body
+# The events refer to drivers and riders, so their table is
+# encoded first.
+self._body = BytesIO()
+events = self._events
+self.write_ints((EVENT_CLASSES.index(type(event))
+for event in events), "b")
+self.write_ints(event.timestamp for event in events)
+self.write_riders(getattr(event, "rider", None) for event in events)
+self.write_drivers(getattr(event, "driver", None)
+for event in events)
+event_table = self._body
+self._body = BytesIO()
+riders = self._riders
+self.write_strings([rider.id for rider in riders])
+self.write_locations([rider.origin for rider in riders])
+self.write_locations([rider.destination for rider in riders])
+self.write_ints(rider.patience for rider in riders)
+self.write_ints((STATUSES.index(rider.status) for rider in riders),
+"b")
+drivers = self._drivers
+self.write_strings([driver.id for driver in drivers])
+self.write_locations([driver.location for driver in drivers])
+self.write_array(array("d", [driver.speed for driver in drivers]))
+self.write_ints((driver.is_idle for driver in drivers), "b")
+file.write(_HEADER.pack(MAGIC, VERSION, sys.byteorder == "little"))
+file.write(self._body.getbuffer())
+file.write(event_table.getbuffer())
+file.write(body.getbuffer())
+self._body = body
+def _rider_index(self, rider):
+"""Return the index of <rider>, adding them to the table of riders
+if they are new, or -1 if <rider> is None.
+@type self: CheckpointWriter
+@type rider: Rider | None
+@rtype: int
+"""
+if rider is None:
+return -1
+index = self._rider_indices.get(rider.id)
+if index is None:
+index = self._rider_indices[rider.id] = len(self._riders)
+self._riders.append(rider)
+return index
+def _driver_index(self, driver):
+"""Return the index of <driver>, adding them to the table of
+drivers if they are new, or -1 if <driver> is None.
+@type self: CheckpointWriter
+@type driver: Driver | None
+@rtype: int
+"""
+if driver is None:
+return -1
+index = self._driver_indices.get(driver.id)
+if index is None:
+index = self._driver_indices[driver.id] = len(self._drivers)
+self._drivers.append(driver)
+return index
+def _event_index(self, event):
+"""Return the index of <event>, adding it to the table of events if
+it is new.
+@type self: CheckpointWriter
+@type event: Event
+@rtype: int
+"""
+index = self._event_indices.get(id(event))
+if index is None:
+index = self._event_indices[id(event)] = len(self._events)
+self._events.append(event)
+return index
+class CheckpointReader:
+"""A decoder of the state of a simulation written by a
+CheckpointWriter.
+The drivers, riders and events of the checkpoint are created when the
+reader is initialized; the rest of the state is then read back in the
+order it was written.
+"""
+# === Private Attributes ===
+# @type _file: file
+# The binary file being read.
+# @type _swap: bool
+# Whether the arrays were written with the other byte order.
+# @type _riders: list[Rider]
+# The riders of the checkpoint, by index.
+# @type _drivers: list[Driver]
+# The drivers of the checkpoint, by index.
+# @type _events: list[Event]
+# The events of the checkpoint, by index.
+def __init__(self, file):
+"""Initialize a CheckpointReader of the binary <file>, reading its
+header and tables.
+@type self: CheckpointReader
+@type file: file
+@rtype: None
+"""
+self._file = file
+magic, version, little = _HEADER.unpack(file.read(_HEADER.size))
+if magic != MAGIC:
+raise ValueError("not a checkpoint file")
+if version != VERSION:
+raise ValueError(
+"unsupported checkpoint version {}".format(version))
+self._swap = bool(little) != (sys.byteorder == "little")
+ids = self.read_strings()
+origins = self.read_locations()
+destinations = self.read_locations()
+patiences = self.read_array()
+statuses = self.read_array()
+self._riders = []
+for i in range(len(ids)):
+rider = Rider(ids[i], origins[i], destinations[i], patiences[i])
+rider.status = STATUSES[statuses[i]]
+self._riders.append(rider)
+ids = self.read_strings()
+locations = self.read_locations()
+speeds = self.read_array()
+idle = self.read_array()
+self._drivers = []
+for i in range(len(ids)):
+speed = speeds[i]
+if speed.is_integer():
+speed = int(speed)
+driver = Driver(ids[i], locations[i], speed)
+driver.is_idle = bool(idle[i])
+self._drivers.append(driver)
+kinds = self.read_array()
+timestamps = self.read_array()
+riders = self.read_riders()
+drivers = self.read_drivers()
+self._events = [make_event(EVENT_CLASSES[kinds[i]], timestamps[i],
+riders[i], drivers[i])
+for i in range(len(kinds))]
+def read_array(self):
+"""Read an array written by write_array or write_ints.
+@type self: CheckpointReader
+@rtype: array
+"""
+typecode, length = _ARRAY.unpack(self._file.read(_ARRAY.size))
+values = array(typecode.decode())
+values.frombytes(self._file.read(length * values.itemsize))
+if self._swap:
+values.byteswap()
+return values
+def read_strings(self):
+"""Read a list of strings written by write_strings.
+@type self: CheckpointReader
+@rtype: list[str]
+"""
+count, length = _STRINGS.unpack(self._file.read(_STRINGS.size))
+if count == 0:
+return []
+return self._file.read(length).decode("utf-8").split("\0")
+def read_locations(self):
+"""Read a list of locations written by write_locations.
+@type self: CheckpointReader
+@rtype: list[Location | None]
+"""
+rows = self.read_array()
+columns = self.read_array()
+return [None if row < 0 else Location(row, column)
+for row, column in zip(rows, columns)]
+def read_riders(self):
+"""Read a list of riders written by write_riders.
+@type self: CheckpointReader
+@rtype: list[Rider | None]
+"""
+return [None if index < 0 else self._riders[index]
+for index in self.read_array()]
+def read_drivers(self):
+"""Read a list of drivers written by write_drivers.
+@type self: CheckpointReader
+@rtype: list[Driver | None]
+"""
+return [None if index < 0 else self._drivers[index]
+for index in self.read_array()]
+def read_events(self):
+"""Read a list of events written by write_events.
+@type self: CheckpointReader
+@rtype: list[Event]
+"""
+return [self._events[index] for index in self.read_array()]
+class Checkpointer:
+"""Saves checkpoints of a simulation to a file at regular intervals of
+simulation time.
+Each checkpoint replaces the one before it. It is written to a
+temporary file first, so a crash while saving leaves the previous
+checkpoint intact.
+=== Attributes ===
+@type filename: str
+The name of the checkpoint file.
+@type interval: int
+The simulation time between checkpoints.
+@type num_saved: int
+The number of checkpoints that have been saved.
+"""
+# === Private Attributes ===
+# @type _next_time: int | None
+# The simulation time of the next checkpoint, or None before the
+# first observation.
+def __init__(self, filename, interval=1000):
+"""Initialize a Checkpointer.
+@type self: Checkpointer
+@type filename: str
+@type interval: int
+@rtype: None
+"""
+self.filename = filename
+self.interval = interval
+self.num_saved = 0
+self._next_time = None
+def observe(self, timestamp, consumed, queue, dispatcher, monitor):
+"""Save a checkpoint if the simulation has reached the time of the
+next one.
+The first checkpoint is at the first multiple of the interval after
+the first time observed.
+@type self: Checkpointer
+@type timestamp: int
+@type consumed: int
+The number of initial events that have been taken by the
+simulation.
+@type queue: PriorityQueue | CalendarQueue
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: None
+"""
+if self._next_time is None:
+self._next_time = timestamp - timestamp % self.interval + \
+self.interval
+if timestamp >= self._next_time:
+save_checkpoint(self.filename, timestamp, consumed, queue,
+dispatcher, monitor)
+self.num_saved += 1
+self._next_time = timestamp - timestamp % self.interval + \
+self.interval
+def save_checkpoint(filename, timestamp, consumed, queue, dispatcher,
+monitor):
+"""Save a checkpoint of a simulation at <timestamp> to <filename>.
+@type filename: str
+@type timestamp: int
+@type consumed: int
+The number of initial events that have been taken by the
+simulation.
+@type queue: PriorityQueue | CalendarQueue
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: None
+"""
+writer = CheckpointWriter()
+writer.write_ints([timestamp, consumed])
+writer.write_events(queue.items)
+dispatcher.write_state(writer)
+monitor.write_state(writer)
+temporary = filename + ".tmp"
+with open(temporary, "wb") as file:
+writer.dump(file)
+os.replace(temporary, filename)
+def load_checkpoint(filename, queue, dispatcher, monitor):
+"""Restore the checkpoint in <filename> into the empty <queue>,
+<dispatcher> and <monitor>, and return the time of the checkpoint and
+the number of initial events that had been taken.
+<dispatcher> and <monitor> must be of the same classes and have the
+same options as the ones that were saved.
+@type filename: str
+@type queue: PriorityQueue | CalendarQueue
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: (int, int)
+>>> from container import PriorityQueue
+>>> from dispatcher import Dispatcher
+>>> from monitor import AggregateMonitor
+>>> from event import create_event_list
+>>> import tempfile
+>>> queue = PriorityQueue()
+>>> dispatcher = Dispatcher()
+>>> monitor = AggregateMonitor()
+>>> events = create_event_list("events.txt")
+>>> queue.add_all(events)
+>>> for _ in range(5):
+...     for event in queue.remove().do(dispatcher, monitor) or []:
+...         event.handle = queue.schedule(event)
+>>> directory = tempfile.mkdtemp()
+>>> filename = os.path.join(directory, "checkpoint")
+>>> save_checkpoint(filename, 3, len(events), queue, dispatcher,
+...                 monitor)
+>>> restored = PriorityQueue()
+>>> load_checkpoint(filename, restored, Dispatcher(), AggregateMonitor())
+(3, 14)
+>>> [str(event) for event in restored.items] == \\
+...     [str(event) for event in queue.items]
+True
+"""
+with open(filename, "rb") as file:
+reader = CheckpointReader(file)
+timestamp, consumed = reader.read_array()
+for event in reader.read_events():
+event.handle = queue.schedule(event)
+dispatcher.read_state(reader)
+monitor.read_state(reader)
+return timestamp, consumed
+"""Compact events
+An event loop in which each scheduled event is a tuple
+(timestamp, sequence number, kind, rider, driver) instead of an Event
+object, where the kind is the Event class. Tuples compare natively, in
+timestamp order and then in the order they were scheduled.
+Each kind of event is done by the rule of its Event class, the same code
+that Event.do runs, with the EventLoop as its scheduler: the rule schedules
+the events it spawns directly as tuples instead of returning a list of
+Event objects. The public Event classes are still used to build the
+initial events.
+"""
+from heapq import heappush, heappop, heapify
+from rider import Rider
+from event import RiderRequest, Cancellation, Pickup, EVENT_ORDER, \
+next_incoming
+def encode_event(event):
+"""Return the kind, rider and driver of <event>, as they are stored in
+a compact event.
+@type event: Event
+@rtype: (type, Rider | None, Driver | None)
+>>> from location import Location
+>>> rider = Rider("Cerise", Location(4, 2), Location(1, 5), 15)
+>>> encode_event(RiderRequest(10, rider)) == (RiderRequest, rider, None)
+True
+"""
+kind = type(event)
+if kind not in EVENT_ORDER:
+raise ValueError("{} has no compact encoding".format(event))
+return kind, getattr(event, "rider", None), getattr(event, "driver",
+None)
+class EventLoop:
+"""The event queue of a simulation, holding compact events, and the
+scheduler that the rules of the events are given.
+=== Attributes ===
+@type dispatcher: Dispatcher
+The dispatcher of the simulation.
+@type monitor: Monitor
+The monitor of the simulation.
+"""
+# === Private Attributes ===
+# @type _queue: list[(int, int, type, Rider | None, Driver | None)]
+# The scheduled events, as a heap.
+# @type _count: int
+# The number of events that have been scheduled.
+# @type _pending: dict[str, list[int]]
+# The sequence numbers of the Pickup and Cancellation events of
+# each rider that are still in _queue, by id.
+# @type _cancelled: set[int]
+# The sequence numbers of the events in _queue that have been
+# cancelled.
+def __init__(self, dispatcher, monitor):
+"""Initialize an EventLoop with no events.
+@type self: EventLoop
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: None
+"""
+self.dispatcher = dispatcher
+self.monitor = monitor
+self._queue = []
+self._count = 0
+self._pending = {}
+self._cancelled = set()
+def schedule(self, timestamp, kind, rider, driver):
+"""Schedule an event of class <kind> at <timestamp>, and return
+its sequence number.
+@type self: EventLoop
+@type timestamp: int
+@type kind: type
+@type rider: Rider | None
+@type driver: Driver | None
+@rtype: int
+"""
+count = self._count
+heappush(self._queue, (timestamp, count, kind, rider, driver))
+self._count = count + 1
+return count
+def track(self, rider, count):
+"""Record that the event with sequence number <count> is a pending
+Pickup or Cancellation of <rider>.
+@type self: EventLoop
+@type rider: Rider
+@type count: int
+@rtype: None
+"""
+pending = self._pending.get(rider.id)
+if pending is None:
+self._pending[rider.id] = [count]
+else:
+pending.append(count)
+def cancel(self, rider):
+"""Cancel the pending events of <rider>.
+@type self: EventLoop
+@type rider: Rider
+@rtype: None
+"""
+self._cancelled.update(self._pending.pop(rider.id, ()))
+def forget(self, rider):
+"""Stop tracking the pending events of <rider>, leaving them
+scheduled.
+@type self: EventLoop
+@type rider: Rider
+@rtype: None
+"""
+self._pending.pop(rider.id, None)
+def run(self, initial_events):
+"""Do the events in <initial_events> and every event they spawn,
+in order.
+<initial_events> is either a list, or an iterator of events sorted
+by timestamp, as for Simulation.run, which raises a ValueError if
+they are not sorted.
+The events are done exactly as a Simulation without compact does
+them, and once they are all done, no cancelled or pending events
+are left over.
+@type self: EventLoop
+@type initial_events: list[Event] | iterator[Event]
+@rtype: None
+>>> from dispatcher import Dispatcher
+>>> from monitor import AggregateMonitor
+>>> from simulation import Simulation
+>>> from workload import seeded_stream, generate_events
+>>> loop = EventLoop(Dispatcher(), AggregateMonitor())
+>>> loop.run(generate_events(seeded_stream(1, 0), num_riders=2000))
+>>> len(loop._cancelled), len(loop._pending)
+(0, 0)
+>>> loop.monitor.report() == Simulation(
+...     monitor_class=AggregateMonitor).run(
+...     generate_events(seeded_stream(1, 0), num_riders=2000))
+True
+"""
+queue = self._queue
+cancelled = self._cancelled
+pending = self._pending
+if isinstance(initial_events, list):
+for event in initial_events:
+queue.append((event.timestamp, self._count) +
+encode_event(event))
+self._count += 1
+heapify(queue)
+initial_events = []
+incoming = iter(initial_events)
+next_event = next(incoming, None)
+while next_event is not None or queue:
+# An incoming event goes before queued events with the same
+# timestamp, as if it had been added to the queue first.
+if next_event is not None and (
+not queue or next_event.timestamp <= queue[0][0]):
+kind, rider, driver = encode_event(next_event)
+timestamp = next_event.timestamp
+next_event = next_incoming(incoming, next_event)
+else:
+timestamp, count, kind, rider, driver = heappop(queue)
+if count in cancelled:
+cancelled.remove(count)
+continue
+if kind is Pickup or kind is Cancellation:
+# The event is no longer in the queue, so it can no
+# longer be cancelled.
+counts = pending.get(rider.id)
+if counts is not None and count in counts:
+counts.remove(count)
+if not counts:
+del pending[rider.id]
+kind.rule(self, timestamp, rider, driver)
+from collections import deque, OrderedDict
+from heapq import heappush, heappop, heapify
+from operator import itemgetter
+"""
+=== Constants ===
+@type COMPACT_SIZE: int
+The number of cancelled items a queue must hold before it discards
+them all at once.
+"""
+COMPACT_SIZE = 64
 class Container:
 """A container that holds objects.
 This is an abstract class. Only child classes should be
@@ -22,6 +1243,31 @@ def is_empty(self):
 @rtype: bool
 """
 raise NotImplementedError("Implemented in a subclass")
+class Handle:
+"""A handle to an item that has been added to a queue. The handle can
+be used to cancel the item, so that it is skipped instead of removed.
+=== Attributes ===
+@type item: object
+The item.
+@type active: bool
+True iff the item is still in the queue and has not been cancelled.
+"""
+def __init__(self, queue, item):
+"""Initialize a Handle to <item> in <queue>.
+@type self: Handle
+@type queue: PriorityQueue | CalendarQueue
+@type item: object
+@rtype: None
+"""
+self.item = item
+self.active = True
+self._queue = queue
+def cancel(self):
+"""Cancel the item, if it is still in the queue.
+@type self: Handle
+@rtype: None
+"""
+self._queue.cancel(self)
 class PriorityQueue(Container):
 """A queue of items that operates in priority order.
 Items are removed from the queue according to priority; the item with
@@ -34,20 +1280,34 @@ the
 container (__lt__, __le__, __gt__, __ge__).
 If x < y, then x has a *HIGHER* priority than y.
 All objects in the container must be of the same type.
+An item that is added with schedule() can later be cancelled through
+its Handle. Cancelled items stay in the queue until they reach the
+front, and are then skipped.
 """
 # === Private Attributes ===
-# @type _items: list
-# The items stored in the priority queue.
+# @type _items: list[(object, int, Handle)]
+# The items stored in the priority queue, each paired with the
+# insertion number at which it was added and its handle.
+# @type _count: int
+# The number of items that have ever been added to the queue.
+# @type _cancelled: int
+# The number of cancelled items still stored in _items.
+# @type _skipped: int
+# The number of cancelled items that have been discarded.
 #
 # === Representation Invariants ===
-# _items is a sorted list, where the first item in the queue is the
-# item with the highest priority.
+# _items is a binary min-heap, so the first entry in the queue is the
+# item with the highest priority. Items of equal priority are ordered
+# by their insertion number, which keeps ties in FIFO order.
 def __init__(self):
 """Initialize an empty PriorityQueue.
 @type self: PriorityQueue
 @rtype: None
 """
 self._items = []
+self._count = 0
+self._cancelled = 0
+self._skipped = 0
 def remove(self):
 """Remove and return the next item from this PriorityQueue.
 Precondition: <self> should not be empty.
@@ -67,7 +1327,32 @@ Precondition: <self> should not be empty.
 >>> pq.remove()
 'yellow'
 """
-return self._items.pop(0)
+while True:
+item, _, handle = heappop(self._items)
+if handle.active:
+handle.active = False
+return item
+self._cancelled -= 1
+self._skipped += 1
+def peek(self):
+"""Return the next item from this PriorityQueue without removing
+it.
+Precondition: <self> should not be empty.
+@type self: PriorityQueue
+@rtype: object
+>>> pq = PriorityQueue()
+>>> pq.add("red")
+>>> pq.add("blue")
+>>> pq.peek()
+'blue'
+>>> pq.items
+['blue', 'red']
+"""
+while not self._items[0][2].active:
+heappop(self._items)
+self._cancelled -= 1
+self._skipped += 1
+return self._items[0][0]
 def is_empty(self):
 """
 Return true iff this PriorityQueue is empty.
@@ -80,7 +1365,14 @@ True
 >>> pq.is_empty()
 False
 """
-return len(self._items) == 0
+return len(self._items) == self._cancelled
+def __len__(self):
+"""Return the number of items in this PriorityQueue that have not
+been cancelled.
+@type self: PriorityQueue
+@rtype: int
+"""
+return len(self._items) - self._cancelled
 def add(self, item):
 """Add <item> to this PriorityQueue.
 @type self: PriorityQueue
@@ -94,23 +1386,939 @@ def add(self, item):
 >>> pq.items
 ['blue', 'green', 'red', 'yellow']
 """
-queue = self._items
-if len(queue) == 0:
-queue.append(item)
+self.schedule(item)
+def schedule(self, item):
+"""Add <item> to this PriorityQueue and return a handle that can
+be used to cancel it.
+@type self: PriorityQueue
+@type item: object
+@rtype: Handle
+>>> pq = PriorityQueue()
+>>> handle = pq.schedule("blue")
+>>> pq.add("red")
+>>> handle.cancel()
+>>> pq.remove()
+'red'
+>>> pq.is_empty(), pq.num_skipped
+(True, 1)
+"""
+handle = Handle(self, item)
+heappush(self._items, (item, self._count, handle))
+self._count += 1
+return handle
+def add_all(self, items):
+"""Add every item in <items> to this PriorityQueue.
+Items are numbered in the order given, so ties are removed in
+that order. The queue is rebuilt in one pass rather than by
+adding the items one at a time.
+@type self: PriorityQueue
+@type items: list[object]
+@rtype: None
+>>> pq = PriorityQueue()
+>>> pq.add("red")
+>>> pq.add_all(["yellow", "blue", "green"])
+>>> pq.items
+['blue', 'green', 'red', 'yellow']
+"""
+for item in items:
+self._items.append((item, self._count, Handle(self, item)))
+self._count += 1
+heapify(self._items)
+def cancel(self, handle):
+"""Cancel the item of <handle>, if it is still in this
+PriorityQueue.
+Once more than half of the stored items are cancelled, they are
+discarded all at once.
+@type self: PriorityQueue
+@type handle: Handle
+@rtype: None
+"""
+if handle.active:
+handle.active = False
+self._cancelled += 1
+if self._cancelled >= COMPACT_SIZE and \
+self._cancelled * 2 > len(self._items):
+self._items = [entry for entry in self._items
+if entry[2].active]
+heapify(self._items)
+self._skipped += self._cancelled
+self._cancelled = 0
+@property
+def num_skipped(self):
+"""Return the number of cancelled items that have been discarded.
+@type self: PriorityQueue
+@rtype: int
+"""
+return self._skipped
+@property
+def items(self):
+# Sorting by insertion number and then stably by item gives the
+# order of the entries, comparing each pair of items only once.
+entries = sorted(self._items, key=itemgetter(1))
+entries.sort(key=itemgetter(0))
+return [entry[0] for entry in entries if entry[2].active]
+class CalendarQueue(Container):
+"""A queue of items with integer timestamps that operates in
+timestamp order.
+Items are removed in order of their <timestamp> attribute, and items
+with the same timestamp are removed in FIFO order, just like a
+PriorityQueue of Events.
+Each of the next <num_buckets> timestamps has its own bucket, so
+adding and removing an item that is within that horizon is O(1).
+Items further in the future wait in an overflow heap until the
+horizon reaches them.
+Like a PriorityQueue, items added with schedule() can be cancelled.
+Adding an item that is older than the start of the horizon moves the
+horizon back, which takes time proportional to the difference.
+"""
+# === Private Attributes ===
+# @type _buckets: list[deque[Handle]]
+# The handle of the item at time t, for
+# _now <= t < _now + len(_buckets), is stored in
+# _buckets[t % len(_buckets)].
+# @type _overflow: list[(int, int, Handle)]
+# A heap of (timestamp, insertion number, handle) for items at or
+# after _now + len(_buckets).
+# @type _now: int
+# The earliest timestamp an item in the queue may have.
+# @type _in_buckets: int
+# The number of handles stored in _buckets.
+# @type _count: int
+# The number of items that have ever been added to the queue.
+# @type _cancelled: int
+# The number of cancelled handles still stored in the queue.
+# @type _skipped: int
+# The number of cancelled items that have been discarded.
+def __init__(self, num_buckets=256):
+"""Initialize an empty CalendarQueue.
+@type self: CalendarQueue
+@type num_buckets: int
+The number of timestamps covered by the buckets.
+@rtype: None
+"""
+self._buckets = [deque() for _ in range(num_buckets)]
+self._overflow = []
+self._now = 0
+self._in_buckets = 0
+self._count = 0
+self._cancelled = 0
+self._skipped = 0
+def remove(self):
+"""Remove and return the next item from this CalendarQueue.
+Precondition: <self> should not be empty.
+@type self: CalendarQueue
+@rtype: object
+>>> from event import Event
+>>> cq = CalendarQueue(4)
+>>> for t in [9, 2, 2, 0]:
+...     cq.add(Event(t))
+>>> [cq.remove().timestamp for _ in range(4)]
+[0, 2, 2, 9]
+"""
+handle = self._front().popleft()
+self._in_buckets -= 1
+handle.active = False
+return handle.item
+def peek(self):
+"""Return the next item from this CalendarQueue without removing
+it.
+Precondition: <self> should not be empty.
+@type self: CalendarQueue
+@rtype: object
+>>> from event import Event
+>>> cq = CalendarQueue(4)
+>>> cq.add(Event(5))
+>>> cq.peek().timestamp, cq.peek().timestamp
+(5, 5)
+>>> cq.add(Event(1))
+>>> cq.peek().timestamp
+1
+"""
+return self._front()[0].item
+def is_empty(self):
+"""Return true iff this CalendarQueue is empty.
+@type self: CalendarQueue
+@rtype: bool
+>>> from event import Event
+>>> cq = CalendarQueue()
+>>> cq.is_empty()
+True
+>>> cq.add(Event(3))
+>>> cq.is_empty()
+False
+"""
+return self._in_buckets + len(self._overflow) == self._cancelled
+def __len__(self):
+"""Return the number of items in this CalendarQueue that have not
+been cancelled.
+@type self: CalendarQueue
+@rtype: int
+"""
+return self._in_buckets + len(self._overflow) - self._cancelled
+def add(self, item):
+"""Add <item> to this CalendarQueue.
+@type self: CalendarQueue
+@type item: object
+@rtype: None
+"""
+self.schedule(item)
+def schedule(self, item):
+"""Add <item> to this CalendarQueue and return a handle that can
+be used to cancel it.
+@type self: CalendarQueue
+@type item: object
+@rtype: Handle
+"""
+timestamp = item.timestamp
+if timestamp < self._now:
+self._rewind(timestamp)
+handle = Handle(self, item)
+if timestamp < self._now + len(self._buckets):
+self._buckets[timestamp % len(self._buckets)].append(handle)
+self._in_buckets += 1
 else:
-i = 0
-while i < len(queue) and item.__gt__(queue[i]):
-i += 1
-queue.insert(i, item)
+heappush(self._overflow, (timestamp, self._count, handle))
+self._count += 1
+return handle
+def add_all(self, items):
+"""Add every item in <items> to this CalendarQueue.
+@type self: CalendarQueue
+@type items: list[object]
+@rtype: None
+"""
+for item in items:
+self.schedule(item)
+def cancel(self, handle):
+"""Cancel the item of <handle>, if it is still in this
+CalendarQueue.
+Once more than half of the stored items are cancelled, they are
+discarded all at once.
+@type self: CalendarQueue
+@type handle: Handle
+@rtype: None
+>>> from event import Event
+>>> cq = CalendarQueue(4)
+>>> handles = [cq.schedule(Event(t)) for t in [1, 2, 30]]
+>>> handles[0].cancel()
+>>> handles[2].cancel()
+>>> cq.remove().timestamp
+2
+>>> cq.is_empty()
+True
+"""
+if handle.active:
+handle.active = False
+self._cancelled += 1
+if self._cancelled >= COMPACT_SIZE and self._cancelled * 2 > \
+self._in_buckets + len(self._overflow):
+for i in range(len(self._buckets)):
+self._buckets[i] = deque(
+entry for entry in self._buckets[i] if entry.active)
+self._overflow = [entry for entry in self._overflow
+if entry[2].active]
+heapify(self._overflow)
+self._in_buckets = sum(len(bucket)
+for bucket in self._buckets)
+self._skipped += self._cancelled
+self._cancelled = 0
+@property
+def num_skipped(self):
+"""Return the number of cancelled items that have been discarded.
+@type self: CalendarQueue
+@rtype: int
+"""
+return self._skipped
 @property
 def items(self):
-return self._items
+"""Return the items in this CalendarQueue that have not been
+cancelled, in the order they will be removed.
+@type self: CalendarQueue
+@rtype: list[object]
+>>> from event import Event
+>>> cq = CalendarQueue(4)
+>>> for t in [9, 2, 3, 2]:
+...     cq.add(Event(t))
+>>> [event.timestamp for event in cq.items]
+[2, 2, 3, 9]
+"""
+buckets = self._buckets
+items = []
+for t in range(self._now, self._now + len(buckets)):
+items.extend(handle.item for handle in buckets[t % len(buckets)]
+if handle.active)
+items.extend(entry[2].item for entry in sorted(self._overflow)
+if entry[2].active)
+return items
+def _front(self):
+"""Discard cancelled items at the front of this CalendarQueue, and
+return the bucket whose first handle is for the next item.
+Precondition: <self> should not be empty.
+@type self: CalendarQueue
+@rtype: deque[Handle]
+"""
+buckets = self._buckets
+while True:
+if self._in_buckets == 0:
+self._now = self._overflow[0][0]
+self._fill_buckets()
+bucket = buckets[self._now % len(buckets)]
+if bucket:
+if bucket[0].active:
+return bucket
+bucket.popleft()
+self._in_buckets -= 1
+self._cancelled -= 1
+self._skipped += 1
+else:
+self._now += 1
+self._fill_buckets()
+def _rewind(self, timestamp):
+"""Move the start of the horizon back to <timestamp>, moving the
+items that fall beyond the new horizon to the overflow heap.
+@type self: CalendarQueue
+@type timestamp: int
+@rtype: None
+"""
+num_buckets = len(self._buckets)
+for t in range(max(timestamp + num_buckets, self._now),
+self._now + num_buckets):
+bucket = self._buckets[t % num_buckets]
+while bucket:
+heappush(self._overflow, (t, self._count, bucket.popleft()))
+self._count += 1
+self._in_buckets -= 1
+self._now = timestamp
+def _fill_buckets(self):
+"""Move the overflow items that are now within the horizon of
+the buckets into their buckets.
+@type self: CalendarQueue
+@rtype: None
+"""
+overflow = self._overflow
+horizon = self._now + len(self._buckets)
+while overflow and overflow[0][0] < horizon:
+timestamp, _, handle = heappop(overflow)
+self._buckets[timestamp % len(self._buckets)].append(handle)
+self._in_buckets += 1
+class KeyedQueue(Container):
+"""A first-in, first-out queue of items that are identified by their
+<id> attribute.
+Adding, removing and discarding an item are all O(1). Adding an item
+whose id is already in the queue leaves it in its current place.
+"""
+# === Private Attributes ===
+# @type _items: OrderedDict[str, object]
+# The items in the queue by id, oldest first.
+def __init__(self):
+"""Initialize an empty KeyedQueue.
+@type self: KeyedQueue
+@rtype: None
+"""
+self._items = OrderedDict()
+def __len__(self):
+"""Return the number of items in this KeyedQueue.
+@type self: KeyedQueue
+@rtype: int
+"""
+return len(self._items)
+def __contains__(self, item):
+"""Return True iff an item with the id of <item> is in this
+KeyedQueue.
+@type self: KeyedQueue
+@type item: object
+@rtype: bool
+"""
+return item.id in self._items
+def __iter__(self):
+"""Return an iterator over the items, oldest first.
+@type self: KeyedQueue
+@rtype: iterator
+"""
+return iter(self._items.values())
+def add(self, item):
+"""Add <item> to the back of this KeyedQueue.
+@type self: KeyedQueue
+@type item: object
+@rtype: None
+"""
+if item.id not in self._items:
+self._items[item.id] = item
+def remove(self):
+"""Remove and return the oldest item in this KeyedQueue.
+Precondition: <self> should not be empty.
+@type self: KeyedQueue
+@rtype: object
+>>> from rider import Rider
+>>> from location import Location
+>>> kq = KeyedQueue()
+>>> kq.add(Rider("A", Location(0, 0), Location(1, 1), 5))
+>>> kq.add(Rider("B", Location(0, 0), Location(1, 1), 5))
+>>> kq.add(Rider("A", Location(0, 0), Location(1, 1), 5))
+>>> kq.remove().id
+'A'
+>>> kq.remove().id
+'B'
+"""
+return self._items.popitem(last=False)[1]
+def discard(self, item):
+"""Remove the item with the id of <item> from this KeyedQueue, if
+there is one.
+@type self: KeyedQueue
+@type item: object
+@rtype: None
+"""
+self._items.pop(item.id, None)
+def is_empty(self):
+"""Return true iff this KeyedQueue is empty.
+@type self: KeyedQueue
+@rtype: bool
+"""
+return len(self._items) == 0
 if __name__ == "__main__":
 import doctest
 doctest.testmod()
+from array import array
+from heapq import heappush, heappop, heapreplace, nsmallest
+from container import KeyedQueue
 from driver import Driver
-from rider import Rider
+from rider import Rider, WAITING
 from location import Location
+class DriverGrid:
+"""A spatial index of drivers on the grid of city blocks.
+The grid is divided into square cells of <cell_size> blocks, and each
+driver is stored in the cell that contains their location. A nearest
+driver search only visits the cells in rings around the location until
+no closer driver can exist.
+Drivers are identified by their id, and are numbered in the order they
+were added.
+=== Attributes ===
+@type last_scanned: int
+The number of drivers whose travel time was computed by the last
+search.
+"""
+# === Private Attributes ===
+# @type _cell_size: int
+# The number of blocks along each side of a cell.
+# @type _cells: dict[(int, int), dict[str, Driver]]
+# The drivers in each non-empty cell, by id.
+# @type _entries: dict[str, ((int, int), int)]
+# The cell and the insertion number of each driver, by id.
+# @type _count: int
+# The number of drivers that have ever been added.
+# @type _max_speed: int
+# The highest speed of any driver that has been added.
+def __init__(self, cell_size=8):
+"""Initialize an empty DriverGrid.
+@type self: DriverGrid
+@type cell_size: int
+@rtype: None
+"""
+self._cell_size = cell_size
+self._cells = {}
+self._entries = {}
+self._count = 0
+self._max_speed = 0
+self.last_scanned = 0
+def __len__(self):
+"""Return the number of drivers in this DriverGrid.
+@type self: DriverGrid
+@rtype: int
+"""
+return len(self._entries)
+def __contains__(self, driver):
+"""Return True iff <driver> is in this DriverGrid.
+@type self: DriverGrid
+@type driver: Driver
+@rtype: bool
+"""
+return driver.id in self._entries
+def add(self, driver):
+"""Add <driver> to this DriverGrid, after every other driver.
+@type self: DriverGrid
+@type driver: Driver
+@rtype: None
+"""
+self.remove(driver)
+cell = self._cell(driver.location)
+self._cells.setdefault(cell, {})[driver.id] = driver
+self._entries[driver.id] = (cell, self._count)
+self._count += 1
+self._max_speed = max(self._max_speed, driver.speed)
+def remove(self, driver):
+"""Remove <driver> from this DriverGrid, if they are in it.
+@type self: DriverGrid
+@type driver: Driver
+@rtype: None
+"""
+if driver.id in self._entries:
+cell = self._entries.pop(driver.id)[0]
+bucket = self._cells[cell]
+del bucket[driver.id]
+if len(bucket) == 0:
+del self._cells[cell]
+def move(self, driver):
+"""Update the cell of <driver> after their location has changed,
+keeping their place in the order of drivers.
+@type self: DriverGrid
+@type driver: Driver
+@rtype: None
+"""
+if driver.id in self._entries:
+old_cell, number = self._entries[driver.id]
+cell = self._cell(driver.location)
+if cell != old_cell:
+self.remove(driver)
+self._cells.setdefault(cell, {})[driver.id] = driver
+self._entries[driver.id] = (cell, number)
+def drivers(self):
+"""Return the drivers in this DriverGrid in the order they were
+added.
+@type self: DriverGrid
+@rtype: list[Driver]
+"""
+drivers = []
+for bucket in self._cells.values():
+drivers.extend(bucket.values())
+drivers.sort(key=lambda driver: self._entries[driver.id][1])
+return drivers
+def nearest(self, location):
+"""Return the driver with the shortest travel time to <location>,
+or None if this DriverGrid is empty.
+Ties are resolved in favour of the driver added last.
+@type self: DriverGrid
+@type location: Location
+@rtype: Driver | None
+>>> grid = DriverGrid(2)
+>>> grid.add(Driver("A", Location(0, 0), 1))
+>>> grid.add(Driver("B", Location(9, 9), 1))
+>>> grid.add(Driver("C", Location(2, 2), 1))
+>>> grid.nearest(Location(1, 1)).id
+'C'
+>>> grid.nearest(Location(8, 7)).id
+'B'
+"""
+fastest_driver = None
+fastest_time = 0
+fastest_number = 0
+row, column = self._cell(location)
+seen = 0
+for ring, buckets in self._rings(row, column):
+if seen == len(self._entries) or \
+fastest_driver is not None and \
+round(self._ring_distance(ring) / self._max_speed) > \
+fastest_time:
+break
+for bucket in buckets:
+for driver in bucket.values():
+seen += 1
+time = driver.get_travel_time(location)
+number = self._entries[driver.id][1]
+if fastest_driver is None or time < fastest_time or \
+(time == fastest_time and
+number > fastest_number):
+fastest_driver = driver
+fastest_time = time
+fastest_number = number
+self.last_scanned = seen
+return fastest_driver
+def nearest_k(self, location, k):
+"""Return the <k> drivers with the shortest travel times to
+<location>, fastest first, or all of the drivers if there are fewer
+than <k>.
+Ties are resolved in favour of the drivers added last.
+@type self: DriverGrid
+@type location: Location
+@type k: int
+@rtype: list[Driver]
+>>> grid = DriverGrid(2)
+>>> grid.add(Driver("A", Location(0, 0), 1))
+>>> grid.add(Driver("B", Location(9, 9), 1))
+>>> grid.add(Driver("C", Location(2, 2), 1))
+>>> [driver.id for driver in grid.nearest_k(Location(1, 1), 2)]
+['C', 'A']
+"""
+# A heap of the fastest drivers found so far, slowest first.
+fastest = []
+row, column = self._cell(location)
+seen = 0
+for ring, buckets in self._rings(row, column):
+if seen == len(self._entries) or len(fastest) == k and \
+round(self._ring_distance(ring) / self._max_speed) > \
+-fastest[0][0]:
+break
+for bucket in buckets:
+for driver in bucket.values():
+seen += 1
+entry = (-driver.get_travel_time(location),
+self._entries[driver.id][1], driver)
+if len(fastest) < k:
+heappush(fastest, entry)
+elif entry > fastest[0]:
+heapreplace(fastest, entry)
+self.last_scanned = seen
+fastest.sort(reverse=True)
+return [entry[2] for entry in fastest]
+def _cell(self, location):
+"""Return the cell that contains <location>.
+@type self: DriverGrid
+@type location: Location
+@rtype: (int, int)
+"""
+return (location.row // self._cell_size,
+location.column // self._cell_size)
+def _rings(self, row, column):
+"""Yield each ring of cells around the cell (<row>, <column>) that
+has drivers in it, nearest first, as the ring number and the
+drivers in each non-empty cell of the ring.
+Rings are walked cell by cell until more cells have been visited
+than there are non-empty cells. The non-empty cells further away
+are then grouped by ring directly, so that sparse drivers do not
+cost a walk through every empty ring between them.
+@type self: DriverGrid
+@type row: int
+@type column: int
+@rtype: iterator[(int, list[dict[str, Driver]])]
+>>> grid = DriverGrid(1)
+>>> grid.add(Driver("A", Location(0, 0), 1))
+>>> grid.add(Driver("B", Location(50, 50), 1))
+>>> [(ring, [list(bucket) for bucket in buckets])
+...  for ring, buckets in grid._rings(0, 1)]
+[(0, []), (1, [['A']]), (99, [['B']])]
+"""
+cells = self._cells
+ring = 0
+visited = 0
+while visited <= len(cells):
+ring_cells = self._ring(row, column, ring)
+visited += len(ring_cells)
+yield ring, [cells[cell] for cell in ring_cells if cell in cells]
+ring += 1
+rest = {}
+for (cell_row, cell_column), bucket in cells.items():
+distance = abs(cell_row - row) + abs(cell_column - column)
+if distance >= ring:
+rest.setdefault(distance, []).append(bucket)
+for distance in sorted(rest):
+yield distance, rest[distance]
+def _ring(self, row, column, ring):
+"""Return the cells whose Manhattan distance in cells from the cell
+(<row>, <column>) is <ring>.
+@type self: DriverGrid
+@type row: int
+@type column: int
+@type ring: int
+@rtype: list[(int, int)]
+"""
+if ring == 0:
+return [(row, column)]
+cells = []
+for d_row in range(-ring, ring + 1):
+d_column = ring - abs(d_row)
+cells.append((row + d_row, column + d_column))
+if d_column != 0:
+cells.append((row + d_row, column - d_column))
+return cells
+def _ring_distance(self, ring):
+"""Return a lower bound on the Manhattan distance from a location
+to any location in a cell <ring> cells away from its own.
+@type self: DriverGrid
+@type ring: int
+@rtype: int
+"""
+if ring <= 1:
+return ring
+return (ring - 2) * self._cell_size + 2
+class DriverArray:
+"""An index of drivers that keeps their locations and speeds in
+arrays.
+A nearest driver search computes the travel time of every driver in
+one pass over the arrays, without a method call per driver. It has the
+same interface as DriverGrid, and finds the same drivers.
+Drivers are identified by their id, and are numbered in the order they
+were added.
+=== Attributes ===
+@type last_scanned: int
+The number of drivers whose travel time was computed by the last
+search.
+"""
+# === Private Attributes ===
+# @type _drivers: list[Driver]
+# The drivers, in no particular order.
+# @type _rows: array[int]
+# @type _columns: array[int]
+# @type _speeds: array[int]
+# The location and speed of each driver in _drivers.
+# @type _numbers: array[int]
+# The insertion number of each driver in _drivers.
+# @type _positions: dict[str, int]
+# The index of each driver in _drivers, by id.
+# @type _count: int
+# The number of drivers that have ever been added.
+def __init__(self):
+"""Initialize an empty DriverArray.
+@type self: DriverArray
+@rtype: None
+"""
+self._drivers = []
+self._rows = array("q")
+self._columns = array("q")
+self._speeds = array("q")
+self._numbers = array("q")
+self._positions = {}
+self._count = 0
+self.last_scanned = 0
+def __len__(self):
+"""Return the number of drivers in this DriverArray.
+@type self: DriverArray
+@rtype: int
+"""
+return len(self._drivers)
+def __contains__(self, driver):
+"""Return True iff <driver> is in this DriverArray.
+@type self: DriverArray
+@type driver: Driver
+@rtype: bool
+"""
+return driver.id in self._positions
+def add(self, driver):
+"""Add <driver> to this DriverArray, after every other driver.
+@type self: DriverArray
+@type driver: Driver
+@rtype: None
+"""
+self.remove(driver)
+self._positions[driver.id] = len(self._drivers)
+self._drivers.append(driver)
+self._rows.append(driver.location.row)
+self._columns.append(driver.location.column)
+self._speeds.append(driver.speed)
+self._numbers.append(self._count)
+self._count += 1
+def remove(self, driver):
+"""Remove <driver> from this DriverArray, if they are in it.
+The last driver in the arrays takes their place.
+@type self: DriverArray
+@type driver: Driver
+@rtype: None
+"""
+index = self._positions.pop(driver.id, None)
+if index is None:
+return
+last = self._drivers.pop()
+rows, columns = self._rows, self._columns
+speeds, numbers = self._speeds, self._numbers
+if index < len(self._drivers):
+self._drivers[index] = last
+self._positions[last.id] = index
+rows[index] = rows[-1]
+columns[index] = columns[-1]
+speeds[index] = speeds[-1]
+numbers[index] = numbers[-1]
+rows.pop()
+columns.pop()
+speeds.pop()
+numbers.pop()
+def move(self, driver):
+"""Update the location of <driver> after it has changed, keeping
+their place in the order of drivers.
+@type self: DriverArray
+@type driver: Driver
+@rtype: None
+"""
+index = self._positions.get(driver.id)
+if index is not None:
+self._rows[index] = driver.location.row
+self._columns[index] = driver.location.column
+def drivers(self):
+"""Return the drivers in this DriverArray in the order they were
+added.
+@type self: DriverArray
+@rtype: list[Driver]
+"""
+numbers = self._numbers
+order = sorted(range(len(self._drivers)), key=numbers.__getitem__)
+return [self._drivers[index] for index in order]
+def nearest(self, location):
+"""Return the driver with the shortest travel time to <location>,
+or None if this DriverArray is empty.
+Ties are resolved in favour of the driver added last.
+@type self: DriverArray
+@type location: Location
+@rtype: Driver | None
+>>> drivers = DriverArray()
+>>> drivers.add(Driver("A", Location(0, 0), 1))
+>>> drivers.add(Driver("B", Location(9, 9), 1))
+>>> drivers.add(Driver("C", Location(2, 0), 1))
+>>> drivers.nearest(Location(1, 0)).id
+'C'
+>>> drivers.remove(drivers.nearest(Location(1, 0)))
+>>> drivers.nearest(Location(8, 7)).id
+'B'
+"""
+self.last_scanned = len(self._drivers)
+if len(self._drivers) == 0:
+return None
+row = location.row
+column = location.column
+times = [round((abs(r - row) + abs(c - column)) / s)
+for r, c, s in zip(self._rows, self._columns, self._speeds)]
+fastest_time = min(times)
+numbers = self._numbers
+fastest = index = times.index(fastest_time)
+for _ in range(times.count(fastest_time) - 1):
+index = times.index(fastest_time, index + 1)
+if numbers[index] > numbers[fastest]:
+fastest = index
+return self._drivers[fastest]
+def nearest_k(self, location, k):
+"""Return the <k> drivers with the shortest travel times to
+<location>, fastest first, or all of the drivers if there are fewer
+than <k>.
+Ties are resolved in favour of the drivers added last.
+@type self: DriverArray
+@type location: Location
+@type k: int
+@rtype: list[Driver]
+>>> drivers = DriverArray()
+>>> drivers.add(Driver("A", Location(0, 0), 1))
+>>> drivers.add(Driver("B", Location(9, 9), 1))
+>>> drivers.add(Driver("C", Location(2, 2), 1))
+>>> [driver.id for driver in drivers.nearest_k(Location(1, 1), 2)]
+['C', 'A']
+"""
+self.last_scanned = len(self._drivers)
+row = location.row
+column = location.column
+times = [round((abs(r - row) + abs(c - column)) / s)
+for r, c, s in zip(self._rows, self._columns, self._speeds)]
+numbers = self._numbers
+fastest = nsmallest(k, range(len(times)),
+key=lambda i: (times[i], -numbers[i]))
+return [self._drivers[index] for index in fastest]
+class DriverRegistry:
+"""The drivers registered with a dispatcher, by id.
+Every registered driver is either available for rider requests or
+busy. Registering a driver and moving them between the two states
+are O(1), and the available drivers are kept in an index, either a
+DriverGrid or a DriverArray.
+"""
+# === Private Attributes ===
+# @type _drivers: dict[str, Driver]
+# The registered drivers, by id.
+# @type _available: DriverGrid | DriverArray
+# The registered drivers that are available.
+def __init__(self, index_class=DriverGrid):
+"""Initialize an empty DriverRegistry.
+@type self: DriverRegistry
+@type index_class: type
+The index of available drivers, DriverGrid or DriverArray.
+@rtype: None
+"""
+self._drivers = {}
+self._available = index_class()
+def __len__(self):
+"""Return the number of registered drivers.
+@type self: DriverRegistry
+@rtype: int
+"""
+return len(self._drivers)
+def __contains__(self, driver):
+"""Return True iff <driver> is registered.
+@type self: DriverRegistry
+@type driver: Driver
+@rtype: bool
+"""
+return driver.id in self._drivers
+def __iter__(self):
+"""Return an iterator over the registered drivers.
+@type self: DriverRegistry
+@rtype: iterator
+"""
+return iter(self._drivers.values())
+def num_available(self):
+"""Return the number of available drivers.
+@type self: DriverRegistry
+@rtype: int
+"""
+return len(self._available)
+def is_available(self, driver):
+"""Return True iff <driver> is registered and available.
+@type self: DriverRegistry
+@type driver: Driver
+@rtype: bool
+"""
+return driver in self._available
+def set_available(self, driver):
+"""Register <driver> if they are new, and make them available
+after every other available driver.
+@type self: DriverRegistry
+@type driver: Driver
+@rtype: None
+>>> registry = DriverRegistry()
+>>> d = Driver("A", Location(0, 0), 1)
+>>> registry.set_available(d)
+>>> registry.set_busy(d)
+>>> d in registry, registry.is_available(d)
+(True, False)
+>>> registry.set_available(d)
+>>> registry.is_available(d)
+True
+"""
+self._drivers[driver.id] = driver
+self._available.add(driver)
+def set_busy(self, driver):
+"""Make <driver> unavailable for rider requests.
+@type self: DriverRegistry
+@type driver: Driver
+@rtype: None
+"""
+self._available.remove(driver)
+def move(self, driver):
+"""Update the index of available drivers after the location of
+<driver> has changed.
+@type self: DriverRegistry
+@type driver: Driver
+@rtype: None
+"""
+self._available.move(driver)
+def available_drivers(self):
+"""Return the available drivers, in the order they became
+available.
+@type self: DriverRegistry
+@rtype: list[Driver]
+"""
+return self._available.drivers()
+def busy_drivers(self):
+"""Return the registered drivers that are busy.
+@type self: DriverRegistry
+@rtype: list[Driver]
+"""
+return [driver for driver in self._drivers.values()
+if driver not in self._available]
+def nearest_available(self, location):
+"""Return the available driver with the shortest travel time to
+<location>, or None if no driver is available.
+@type self: DriverRegistry
+@type location: Location
+@rtype: Driver | None
+"""
+return self._available.nearest(location)
+def nearest_available_k(self, location, k):
+"""Return the <k> available drivers with the shortest travel times
+to <location>, fastest first.
+@type self: DriverRegistry
+@type location: Location
+@type k: int
+@rtype: list[Driver]
+"""
+return self._available.nearest_k(location, k)
+def last_scan_length(self):
+"""Return the number of drivers examined by the last search for
+available drivers.
+@type self: DriverRegistry
+@rtype: int
+"""
+return self._available.last_scanned
 class Dispatcher:
 """A dispatcher fulfills requests from riders and drivers for a
 ride-sharing service.
@@ -126,14 +2334,97 @@ the dispatcher does nothing. Once a driver requests a rider, the
 driver
 is registered with the dispatcher, and will be used to fulfill future
 rider requests.
+A dispatcher with a batching window of <window> time units does not
+assign drivers to riders as they request them. Instead, it collects the
+riders who request a driver and matches them to available drivers all
+at once, <window> time units later, so that the total travel time of
+the drivers to the riders is as small as possible.
 """
-def __init__(self):
+# === Private Attributes ===
+# @type _riders: KeyedQueue[Rider]
+# The riders waiting for a driver.
+# @type _drivers: DriverRegistry
+# The registered drivers.
+# @type _rider_events: dict[str, list[Event]]
+# The pending Pickup and Cancellation events of each rider that are
+# still in the event queue, by id. Riders without any are left out.
+# @type _index_class: type
+# The index of available drivers used by _drivers.
+# @type _window: int
+# The batching window, or 0 if riders are assigned a driver as soon
+# as they request one.
+# @type _candidates: int
+# The number of nearest available drivers considered for each rider
+# in a batch.
+# @type _batch: KeyedQueue[Rider]
+# The riders waiting for the next batch to be matched.
+# @type _batch_time: int | None
+# The time the next batch will be matched, or None if no match is
+# scheduled.
+# @type _batch_scans: list[int]
+# The number of drivers examined for each rider of the last batch.
+# @type _reserved: set[str]
+# The ids of the drivers matched to a rider by a batch whose Pickup
+# has not been done yet. They are not available.
+def __init__(self, index_class=DriverGrid, window=0, candidates=16):
 """Initialize a Dispatcher.
 @type self: Dispatcher
+@type index_class: type
+The index used to find the nearest available driver, either
+DriverGrid or DriverArray.
+@type window: int
+The batching window, or 0 to assign a driver to each rider as
+soon as they request one.
+@type candidates: int
+The number of nearest available drivers considered for each
+rider in a batch.
 @rtype: None
 """
-self.waiting_riders = []
-self.available_drivers = []
+self._riders = KeyedQueue()
+self._drivers = DriverRegistry(index_class)
+self._rider_events = {}
+self._index_class = index_class
+self._window = window
+self._candidates = candidates
+self._batch = KeyedQueue()
+self._batch_time = None
+self._reserved = set()
+self._batch_scans = []
+@property
+def waiting_riders(self):
+"""Return the waiting riders, in the order they started waiting.
+@type self: Dispatcher
+@rtype: list[Rider]
+"""
+return list(self._riders)
+@waiting_riders.setter
+def waiting_riders(self, riders):
+"""Replace the waiting riders with <riders>.
+@type self: Dispatcher
+@type riders: list[Rider]
+@rtype: None
+"""
+self._riders = KeyedQueue()
+for rider in riders:
+self._riders.add(rider)
+@property
+def available_drivers(self):
+"""Return the available drivers, in the order they became
+available.
+@type self: Dispatcher
+@rtype: list[Driver]
+"""
+return self._drivers.available_drivers()
+@available_drivers.setter
+def available_drivers(self, drivers):
+"""Replace the available drivers with <drivers>.
+@type self: Dispatcher
+@type drivers: list[Driver]
+@rtype: None
+"""
+self._drivers = DriverRegistry(self._index_class)
+for driver in drivers:
+self._drivers.set_available(driver)
 def __str__(self):
 """Return a string representation.
 @type self: Dispatcher
@@ -162,22 +2453,34 @@ True
 >>> dis1.request_driver(r1) == d1
 True
 """
-if len(self.available_drivers) == 0:
-self.waiting_riders.append(rider)
+if self._drivers.num_available() == 0:
+self._riders.add(rider)
 return None
 else:
-if len(self.available_drivers) == 1:
-fastest_driver = self.available_drivers[0]
-fastest_driver.is_idle = False
-return fastest_driver
-else:
-fastest_driver = self.available_drivers[0]
-for available_driver in self.available_drivers[1:]:
-if available_driver.start_drive(rider.origin) <=\
-fastest_driver.start_drive(rider.origin):
-fastest_driver = available_driver
+fastest_driver = self._drivers.nearest_available(rider.origin)
 fastest_driver.is_idle = False
 return fastest_driver
+def last_scan_length(self):
+"""Return the number of drivers examined by the last search for an
+available driver.
+@type self: Dispatcher
+@rtype: int
+"""
+return self._drivers.last_scan_length()
+def batch_scan_lengths(self):
+"""Return the number of drivers examined for each rider of the last
+batch, in the order of the riders.
+@type self: Dispatcher
+@rtype: list[int]
+>>> dis = Dispatcher(window=5, candidates=1)
+>>> dis.available_drivers = [Driver("A", Location(0, 0), 1),
+...                          Driver("B", Location(0, 4), 1)]
+>>> dis.add_to_batch(Rider("X", Location(0, 3), Location(9, 9), 9))
+>>> dis.add_to_batch(Rider("Y", Location(0, 5), Location(9, 9), 9))
+>>> len(dis.match_batch()), len(dis.batch_scan_lengths())
+(1, 2)
+"""
+return self._batch_scans
 def request_rider(self, driver):
 """Return a rider for the driver, or None if no rider is
 available.
@@ -198,22 +2501,377 @@ True
 >>> dis1.request_rider(d1) == r1
 True
 """
-if driver not in self.available_drivers:
-self.available_drivers.append(driver)
-if len(self.waiting_riders) == 0:
-return None
-else:
-selected_rider = self.waiting_riders.pop(0)
-driver.is_idle = False
-return selected_rider
-def cancel_ride(self, rider):
-"""Cancel the ride for rider.
+if not self._drivers.is_available(driver):
+self._drivers.set_available(driver)
+if self._riders.is_empty():
+return None
+else:
+selected_rider = self._riders.remove()
+driver.is_idle = False
+return selected_rider
+def request_riders(self, drivers):
+"""Return a rider for each driver in <drivers>, or None for the
+drivers left over once no rider is available, as if request_rider
+were called for each of them in order.
+New drivers are all registered first, and then the waiting riders
+are handed out in one pass.
+@type self: Dispatcher
+@type drivers: list[Driver]
+@rtype: list[Rider | None]
+>>> dis = Dispatcher()
+>>> dis.waiting_riders = [Rider("C", Location(0, 0),
+...                             Location(10, 23), 10)]
+>>> d1 = Driver("D", Location(3, 3), 10)
+>>> d2 = Driver("E", Location(4, 4), 10)
+>>> [rider and rider.id for rider in dis.request_riders([d1, d2])]
+['C', None]
+>>> len(dis.available_drivers)
+2
+"""
+for driver in drivers:
+if not self._drivers.is_available(driver):
+self._drivers.set_available(driver)
+riders = []
+for driver in drivers:
+if self._riders.is_empty():
+riders.append(None)
+else:
+riders.append(self._riders.remove())
+driver.is_idle = False
+return riders
+def cancel_ride(self, rider):
+"""Cancel the ride for rider.
+@type self: Dispatcher
+@type rider: Rider
+@rtype: None
+"""
+self._riders.discard(rider)
+self._batch.discard(rider)
+def configure(self, window=None, candidates=None):
+"""Change the batching window and the number of candidates for each
+rider in a batch. Parameters that are None are left unchanged.
+Riders already waiting for a batch are still matched when it was
+scheduled, even if batching is turned off.
+@type self: Dispatcher
+@type window: int | None
+@type candidates: int | None
+@rtype: None
+>>> dis = Dispatcher()
+>>> dis.configure(window=5)
+>>> dis.is_batching()
+True
+"""
+if window is not None:
+self._window = window
+if candidates is not None:
+self._candidates = candidates
+def is_batching(self):
+"""Return True iff this dispatcher matches riders in batches.
+@type self: Dispatcher
+@rtype: bool
+"""
+return self._window > 0
+def add_to_batch(self, rider):
+"""Add <rider> to the riders waiting for the next batch.
+@type self: Dispatcher
+@type rider: Rider
+@rtype: None
+"""
+self._batch.add(rider)
+def schedule_batch(self, timestamp):
+"""Return the time at which the next batch should be matched, or
+None if it is already scheduled or no rider is waiting for it.
+Batches are matched at multiples of the batching window.
+@type self: Dispatcher
+@type timestamp: int
+The current time.
+@rtype: int | None
+"""
+if self._batch_time is not None or self._batch.is_empty():
+return None
+self._batch_time = (timestamp // self._window + 1) * self._window
+return self._batch_time
+def match_batch(self):
+"""Match the riders waiting for this batch to available drivers,
+and return the matched pairs.
+Each driver is matched to at most one rider, and the total travel
+time of the drivers to their riders is as small as possible. If
+there are more riders than drivers, the riders who requested first
+are matched. Riders who are not matched wait for the next batch, or
+join the waiting list if no driver is available at all.
+The matched drivers are reserved for their riders: they are not
+available again until release_driver is called for them.
+@type self: Dispatcher
+@rtype: list[(Rider, Driver)]
+>>> dis = Dispatcher(window=5)
+>>> d1 = Driver("A", Location(0, 0), 1)
+>>> d2 = Driver("B", Location(0, 4), 1)
+>>> dis.available_drivers = [d1, d2]
+>>> dis.add_to_batch(Rider("X", Location(0, 3), Location(9, 9), 9))
+>>> dis.add_to_batch(Rider("Y", Location(0, 5), Location(9, 9), 9))
+>>> [(r.id, d.id) for r, d in dis.match_batch()]
+[('X', 'A'), ('Y', 'B')]
+>>> dis.add_to_batch(Rider("Z", Location(0, 1), Location(9, 9), 9))
+>>> dis.match_batch()
+[]
+>>> [rider.id for rider in dis.waiting_riders]
+['Z']
+>>> dis.release_driver(d2)
+>>> [driver.id for driver in dis.available_drivers]
+['B']
+"""
+self._batch_time = None
+riders = [rider for rider in self._batch if rider.status == WAITING]
+self._batch = KeyedQueue()
+self._batch_scans = []
+num_available = self._drivers.num_available()
+if num_available == 0:
+for rider in riders:
+self._riders.add(rider)
+return []
+candidates = []
+if num_available <= self._candidates:
+# Every rider is a candidate for every driver, so compute the
+# whole matrix of travel times.
+drivers = self._drivers.available_drivers()
+rows = [driver.location.row for driver in drivers]
+columns = [driver.location.column for driver in drivers]
+speeds = [driver.speed for driver in drivers]
+self._batch_scans = [len(drivers)] * len(riders)
+for rider in riders:
+row = rider.origin.row
+column = rider.origin.column
+candidates.append(dict(enumerate(
+[round((abs(r - row) + abs(c - column)) / s)
+for r, c, s in zip(rows, columns, speeds)])))
+else:
+# Only the nearest drivers of each rider are candidates, so the
+# drivers are numbered as they first appear among them, without
+# listing every available driver.
+drivers = []
+positions = {}
+for rider in riders:
+costs = {}
+for driver in self._drivers.nearest_available_k(
+rider.origin, self._candidates):
+j = positions.get(driver.id)
+if j is None:
+j = positions[driver.id] = len(drivers)
+drivers.append(driver)
+costs[j] = driver.get_travel_time(rider.origin)
+self._batch_scans.append(self._drivers.last_scan_length())
+candidates.append(costs)
+pairs = []
+for rider, j in zip(riders, min_cost_assignment(candidates)):
+if j is None:
+self._batch.add(rider)
+else:
+driver = drivers[j]
+driver.is_idle = False
+self._drivers.set_busy(driver)
+self._reserved.add(driver.id)
+pairs.append((rider, driver))
+return pairs
+def release_driver(self, driver):
+"""Make <driver> available again if they were reserved by a batch.
+Other drivers are left as they are.
+@type self: Dispatcher
+@type driver: Driver
+@rtype: None
+"""
+if driver.id in self._reserved:
+self._reserved.remove(driver.id)
+self._drivers.set_available(driver)
+def add_available_driver(self, driver):
+"""Make <driver> available for rider requests again.
+@type self: Dispatcher
+@type driver: Driver
+@rtype: None
+"""
+self._drivers.set_available(driver)
+def remove_available_driver(self, driver):
+"""Stop assigning <driver> to rider requests.
+@type self: Dispatcher
+@type driver: Driver
+@rtype: None
+"""
+self._drivers.set_busy(driver)
+def move_driver(self, driver, location):
+"""Move <driver> to <location>.
+@type self: Dispatcher
+@type driver: Driver
+@type location: Location
+@rtype: None
+"""
+driver.location = location
+self._drivers.move(driver)
+def track_event(self, rider, event):
+"""Record that <event> is a pending Pickup or Cancellation of
+<rider>.
+@type self: Dispatcher
+@type rider: Rider
+@type event: Event
+@rtype: None
+"""
+self._rider_events.setdefault(rider.id, []).append(event)
+def untrack_event(self, rider, event):
+"""Stop tracking <event>, a Pickup or Cancellation of <rider> that
+has been taken out of the event queue to be done.
+@type self: Dispatcher
+@type rider: Rider
+@type event: Event
+@rtype: None
+>>> dis = Dispatcher()
+>>> rider = Rider("C", Location(0, 0), Location(10, 23), 10)
+>>> event = object()
+>>> dis.track_event(rider, event)
+>>> dis.untrack_event(rider, event)
+>>> dis._rider_events
+{}
+"""
+events = self._rider_events.get(rider.id)
+if events is not None:
+# Events are compared by timestamp, so look for this one by
+# identity.
+for index, tracked in enumerate(events):
+if tracked is event:
+del events[index]
+if not events:
+del self._rider_events[rider.id]
+return
+def cancel_events(self, rider):
+"""Cancel the pending events of <rider> in the event queue.
+@type self: Dispatcher
+@type rider: Rider
+@rtype: None
+"""
+for event in self._rider_events.pop(rider.id, []):
+if event.handle is not None:
+event.handle.cancel()
+def forget_events(self, rider):
+"""Stop tracking the pending events of <rider>, leaving them in the
+event queue.
 @type self: Dispatcher
 @type rider: Rider
 @rtype: None
 """
-if rider in self.waiting_riders:
-self.waiting_riders.remove(rider)
+self._rider_events.pop(rider.id, None)
+def write_state(self, writer):
+"""Write the waiting riders, the batch, the registered and reserved
+drivers and the pending events of riders to <writer>.
+@type self: Dispatcher
+@type writer: CheckpointWriter
+@rtype: None
+"""
+writer.write_riders(self._riders)
+writer.write_riders(self._batch)
+writer.write_ints([-1 if self._batch_time is None
+else self._batch_time])
+writer.write_drivers(self._drivers)
+writer.write_drivers(self._drivers.available_drivers())
+writer.write_strings(list(self._reserved))
+writer.write_strings(list(self._rider_events))
+writer.write_ints(len(events) for events in
+self._rider_events.values())
+writer.write_events(event for events in self._rider_events.values()
+for event in events)
+def read_state(self, reader):
+"""Replace the state of this dispatcher with the state read from
+<reader>, as written by write_state.
+Available drivers keep their order, so ties between them are
+resolved as they were before the state was written.
+@type self: Dispatcher
+@type reader: CheckpointReader
+@rtype: None
+"""
+self.waiting_riders = reader.read_riders()
+self._batch = KeyedQueue()
+for rider in reader.read_riders():
+self._batch.add(rider)
+batch_time = reader.read_array()[0]
+self._batch_time = None if batch_time < 0 else batch_time
+self._drivers = DriverRegistry(self._index_class)
+for driver in reader.read_drivers():
+self._drivers.set_available(driver)
+self._drivers.set_busy(driver)
+for driver in reader.read_drivers():
+self._drivers.set_available(driver)
+self._reserved = set(reader.read_strings())
+ids = reader.read_strings()
+counts = reader.read_array()
+events = iter(reader.read_events())
+self._rider_events = {}
+for identifier, count in zip(ids, counts):
+self._rider_events[identifier] = [next(events)
+for _ in range(count)]
+def min_cost_assignment(candidates):
+"""Return the driver assigned to each rider by a matching of riders to
+drivers with the smallest total cost.
+<candidates> has one dict per rider, which maps the index of each
+driver the rider may be matched to to the cost of the match. The
+result has the index of the driver matched to each rider, or None if
+the rider is not matched.
+As many riders as possible are matched, and riders earlier in
+<candidates> are matched first when not all of them can be. Riders are
+added one at a time along a shortest augmenting path, as in the
+Hungarian algorithm, so only the candidate edges are ever examined.
+Drivers that a search fails to get past can never be on an augmenting
+path again, and are left out of later searches.
+@type candidates: list[dict[int, int]]
+@rtype: list[int | None]
+>>> min_cost_assignment([{0: 1, 1: 2}, {0: 1, 1: 5}])
+[1, 0]
+>>> min_cost_assignment([{0: 3}, {0: 1}, {1: 4}])
+[0, None, 1]
+"""
+rider_potentials = [0] * len(candidates)
+driver_potentials = {}
+rider_matches = [None] * len(candidates)
+driver_matches = {}
+dead = set()
+for start in range(len(candidates)):
+# Find the shortest path in reduced costs from <start> to a free
+# driver, through drivers and the riders they are matched to.
+rider_distances = {start: 0}
+driver_distances = {}
+previous = {}
+heap = []
+rider = start
+distance = 0
+free_driver = None
+while free_driver is None:
+for j, cost in candidates[rider].items():
+if j not in driver_distances and j not in dead:
+reduced = cost - rider_potentials[rider] - \
+driver_potentials.get(j, 0)
+heappush(heap, (distance + reduced, j, rider))
+while heap and heap[0][1] in driver_distances:
+heappop(heap)
+if not heap:
+break
+distance, j, previous[j] = heappop(heap)
+driver_distances[j] = distance
+if j in driver_matches:
+rider = driver_matches[j]
+rider_distances[rider] = distance
+else:
+free_driver = j
+if free_driver is None:
+dead.update(driver_distances)
+continue
+# Update the potentials so that the reduced costs stay
+# non-negative, then flip the matches along the path.
+for i, d in rider_distances.items():
+rider_potentials[i] += distance - d
+for j, d in driver_distances.items():
+driver_potentials[j] = driver_potentials.get(j, 0) - \
+(distance - d)
+j = free_driver
+while j is not None:
+i = previous[j]
+driver_matches[j] = i
+j, rider_matches[i] = rider_matches[i], j
+return rider_matches
 from location import Location, manhattan_distance
 from rider import Rider
 class Driver:
@@ -340,6 +2998,10 @@ doctest.testmod()
 This file should contain all of the classes necessary to model the
 different
 kinds of events in the simulation.
+=== Constants ===
+@type EVENT_ORDER: tuple[type]
+The order in which the groups of events of each class are done, when
+all of the events at one timestamp are done together.
 """
 from rider import Rider, WAITING, CANCELLED, SATISFIED
 from dispatcher import Dispatcher
@@ -361,6 +3023,9 @@ Document any such changes carefully!
 === Attributes ===
 @type timestamp: int
 A timestamp for this event.
+@type handle: Handle | None
+The handle the event queue returned when this event was
+scheduled, or None if it has not been scheduled.
 """
 def __init__(self, timestamp):
 """Initialize an Event with a given timestamp.
@@ -373,6 +3038,7 @@ Precondition: must be a non-negative integer.
 7
 """
 self.timestamp = timestamp
+self.handle = None
 # The following six 'magic methods' are overridden to allow for easy
 # comparison of Event instances. All comparisons simply perform the
 # same comparison on the 'timestamp' attribute of the two events.
@@ -486,6 +3152,24 @@ handled in any Event classes.
 @rtype: list[Event]
 """
 raise NotImplementedError("Implemented in a subclass")
+@classmethod
+def do_all(cls, events, dispatcher, monitor):
+"""Do each of <events>, in order, and return the list of new
+events they spawned.
+All of <events> are of this class and have the same timestamp, so a
+subclass can override this method to share work between them.
+@type cls: type
+@type events: list[Event]
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: list[Event]
+"""
+spawned = []
+for event in events:
+result_events = event.do(dispatcher, monitor)
+if result_events is not None:
+spawned.extend(result_events)
+return spawned
 class RiderRequest(Event):
 """A rider requests a driver.
 === Attributes ===
@@ -509,23 +3193,71 @@ the rider.
 Return a Cancellation event. If the rider is assigned to a
 driver,
 also return a Pickup event.
+If the dispatcher matches riders in batches, the rider is added to
+the next batch instead, and a MatchBatch event is returned if the
+batch has not been scheduled yet.
 @type self: RiderRequest
 @type dispatcher: Dispatcher
 @type monitor: Monitor
 @rtype: list[Event]
 """
-monitor.notify(self.timestamp, RIDER, REQUEST,
-self.rider.id, self.rider.origin)
-events = []
-driver = dispatcher.request_driver(self.rider)
+scheduler = Spawner(dispatcher, monitor)
+self.rule(scheduler, self.timestamp, self.rider, None)
+return scheduler.events
+@classmethod
+def do_all(cls, events, dispatcher, monitor):
+"""Do each of the RiderRequests in <events>, in order, notifying
+the monitor of all of the requests at once.
+@type cls: type
+@type events: list[RiderRequest]
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: list[Event]
+"""
+monitor.notify_all(events[0].timestamp, RIDER, REQUEST,
+[event.rider.id for event in events],
+[event.rider.origin for event in events])
+scheduler = Spawner(dispatcher, monitor)
+for event in events:
+cls._request(scheduler, event.timestamp, event.rider)
+return scheduler.events
+@staticmethod
+def rule(scheduler, timestamp, rider, driver):
+"""Do a RiderRequest of <rider> at <timestamp>, as described in
+do(), scheduling the new events with <scheduler>.
+@type scheduler: Spawner | EventLoop
+@type timestamp: int
+@type rider: Rider
+@type driver: None
+@rtype: None
+"""
+scheduler.monitor.notify(timestamp, RIDER, REQUEST, rider.id,
+rider.origin)
+RiderRequest._request(scheduler, timestamp, rider)
+@staticmethod
+def _request(scheduler, timestamp, rider):
+"""Request a driver for <rider> at <timestamp>, and schedule the
+new events with <scheduler>, as described in do().
+@type scheduler: Spawner | EventLoop
+@type timestamp: int
+@type rider: Rider
+@rtype: None
+"""
+dispatcher = scheduler.dispatcher
+if dispatcher.is_batching():
+dispatcher.add_to_batch(rider)
+batch_time = dispatcher.schedule_batch(timestamp)
+if batch_time is not None:
+scheduler.schedule(batch_time, MatchBatch, None, None)
+driver = None
+else:
+driver = dispatcher.request_driver(rider)
 if driver is not None:
-travel_time = driver.start_drive(self.rider.origin)
-events.append(Pickup(self.timestamp + travel_time,
-self.rider,
-driver))
-events.append(Cancellation(self.timestamp + self.rider.patience,
-self.rider))
-return events
+travel_time = driver.start_drive(rider.origin)
+scheduler.track(rider, scheduler.schedule(
+timestamp + travel_time, Pickup, rider, driver))
+scheduler.track(rider, scheduler.schedule(
+timestamp + rider.patience, Cancellation, rider, None))
 def __str__(self):
 """Return a string representation of this event.
 @type self: RiderRequest
@@ -556,22 +3288,62 @@ If a rider is available, return a Pickup event.
 @type monitor: Monitor
 @rtype: list[Event]
 """
+scheduler = Spawner(dispatcher, monitor)
+self.rule(scheduler, self.timestamp, None, self.driver)
+return scheduler.events
+@classmethod
+def do_all(cls, events, dispatcher, monitor):
+"""Do each of the DriverRequests in <events>, in order, notifying
+the monitor of all of the requests at once and handing the waiting
+riders out to all of the drivers in one pass of the dispatcher.
+@type cls: type
+@type events: list[DriverRequest]
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: list[Event]
+"""
+monitor.notify_all(events[0].timestamp, DRIVER, REQUEST,
+[event.driver.id for event in events],
+[event.driver.location for event in events])
+riders = dispatcher.request_riders([event.driver
+for event in events])
+scheduler = Spawner(dispatcher, monitor)
+for event, rider in zip(events, riders):
+cls._assign(scheduler, event.timestamp, rider, event.driver)
+return scheduler.events
+@staticmethod
+def rule(scheduler, timestamp, rider, driver):
+"""Do a DriverRequest of <driver> at <timestamp>, as described in
+do(), scheduling the new events with <scheduler>.
+@type scheduler: Spawner | EventLoop
+@type timestamp: int
+@type rider: None
+@type driver: Driver
+@rtype: None
+"""
 # Notify the monitor about the request.
-monitor.notify(self.timestamp, DRIVER, REQUEST,
-self.driver.id, self.driver.location)
+scheduler.monitor.notify(timestamp, DRIVER, REQUEST, driver.id,
+driver.location)
 # Request a rider from the dispatcher.
-events = []
-rider = dispatcher.request_rider(self.driver)
-# If there is one available, the driver starts driving towards
-the
-# rider, and the method returns a Pickup event for when the
-driver
+rider = scheduler.dispatcher.request_rider(driver)
+DriverRequest._assign(scheduler, timestamp, rider, driver)
+@staticmethod
+def _assign(scheduler, timestamp, rider, driver):
+"""Start <driver> towards <rider>, if there is one, and schedule
+the new events with <scheduler>, as described in do().
+@type scheduler: Spawner | EventLoop
+@type timestamp: int
+@type rider: Rider | None
+@type driver: Driver
+@rtype: None
+"""
+# If there is one available, the driver starts driving towards the
+# rider, and a Pickup event is scheduled for when the driver
 # arrives at the riders location.
 if rider is not None:
-travel_time = self.driver.start_drive(rider.origin)
-events.append(Pickup(self.timestamp + travel_time, rider,
-self.driver))
-return events
+travel_time = driver.start_drive(rider.origin)
+scheduler.track(rider, scheduler.schedule(
+timestamp + travel_time, Pickup, rider, driver))
 def __str__(self):
 """Return a string representation of this event.
 @type self: DriverRequest
@@ -597,23 +3369,42 @@ patience
 @type self: Cancellation
 @type dispatcher: Dispatcher
 @type monitor: Monitor
+@rtype: list[Event]
+"""
+# The event has left the event queue, so it can no longer be
+# cancelled.
+dispatcher.untrack_event(self.rider, self)
+scheduler = Spawner(dispatcher, monitor)
+self.rule(scheduler, self.timestamp, self.rider, None)
+return scheduler.events
+@staticmethod
+def rule(scheduler, timestamp, rider, driver):
+"""Do a Cancellation of <rider> at <timestamp>, as described in
+do().
+@type scheduler: Spawner | EventLoop
+@type timestamp: int
+@type rider: Rider
+@type driver: None
 @rtype: None
 """
-if self.rider.status == WAITING:
-driver = dispatcher.request_driver(self.rider)
+if rider.status == WAITING:
+dispatcher = scheduler.dispatcher
+driver = dispatcher.request_driver(rider)
 if driver is None:
 pass
 else:
-travel_time = driver.start_drive(self.rider.origin)
-if self.timestamp < self.timestamp - self.rider.patience\
-+ travel_time:
-self.rider.status = CANCELLED
+travel_time = driver.start_drive(rider.origin)
+if timestamp < timestamp - rider.patience + travel_time:
+rider.status = CANCELLED
 driver.is_idle = True
-dispatcher.cancel_ride(self.rider)
-monitor.notify(self.timestamp, RIDER, CANCEL,
-self.rider.id, self.rider.origin)
-monitor.notify(self.timestamp, DRIVER, CANCEL,
-driver.id, self.rider.origin)
+dispatcher.cancel_ride(rider)
+scheduler.monitor.notify(timestamp, RIDER, CANCEL,
+rider.id, rider.origin)
+scheduler.monitor.notify(timestamp, DRIVER, CANCEL,
+driver.id, rider.origin)
+# Pickups of a cancelled rider still move the driver,
+# so they are left in the queue.
+scheduler.forget(rider)
 def __str__(self):
 """Return a string representation of cancellation event
 @type self: Cancellation
@@ -645,33 +3436,51 @@ riders location
 @type monitor: Monitor
 @rtype: list[Events]
 """
-events = []
-if self.rider.status == WAITING:
-travel_time = self.driver.start_drive(self.rider.origin)
-if self.timestamp < self.timestamp - travel_time\
-+ self.rider.patience:
-self.driver.location = self.rider.origin
-monitor.notify(self.timestamp, RIDER, PICKUP,
-self.rider.id, self.rider.origin)
-monitor.notify(self.timestamp, DRIVER, PICKUP,
-self.driver.id, self.driver.location)
-dispatcher.available_drivers.remove(self.driver)
-# Append dropoff event
-travel_time = \
-self.driver.get_travel_time(self.rider.destination)
-self.driver.location = self.rider.destination
-self.rider.status = SATISFIED
-events.append(Dropoff(self.timestamp + travel_time,
-self.rider,
-self.driver))
-return events
-if self.rider.status == CANCELLED:
-self.driver.location = self.rider.origin
-self.driver.is_idle = True
-events.append(DriverRequest(self.timestamp, self.driver))
-monitor.notify(self.timestamp, DRIVER, REQUEST,
-self.driver.id, self.driver.location)
-return events
+# The event has left the event queue, so it can no longer be
+# cancelled.
+dispatcher.untrack_event(self.rider, self)
+scheduler = Spawner(dispatcher, monitor)
+self.rule(scheduler, self.timestamp, self.rider, self.driver)
+return scheduler.events
+@staticmethod
+def rule(scheduler, timestamp, rider, driver):
+"""Do a Pickup of <rider> by <driver> at <timestamp>, as described
+in do(), scheduling the new events with <scheduler>.
+@type scheduler: Spawner | EventLoop
+@type timestamp: int
+@type rider: Rider
+@type driver: Driver
+@rtype: None
+"""
+monitor = scheduler.monitor
+# A driver matched by a batch has been reserved for this rider
+# until now, and from here on is treated as one assigned greedily.
+scheduler.dispatcher.release_driver(driver)
+if rider.status == WAITING:
+travel_time = driver.start_drive(rider.origin)
+if timestamp < timestamp - travel_time + rider.patience:
+driver.location = rider.origin
+monitor.notify(timestamp, RIDER, PICKUP, rider.id,
+rider.origin)
+monitor.notify(timestamp, DRIVER, PICKUP, driver.id,
+driver.location)
+scheduler.dispatcher.remove_available_driver(driver)
+# Schedule the dropoff
+travel_time = driver.get_travel_time(rider.destination)
+driver.location = rider.destination
+rider.status = SATISFIED
+# The rider's Cancellation and any other Pickup of this
+# rider would do nothing now.
+scheduler.cancel(rider)
+scheduler.schedule(timestamp + travel_time, Dropoff, rider,
+driver)
+return
+if rider.status == CANCELLED:
+scheduler.dispatcher.move_driver(driver, rider.origin)
+driver.is_idle = True
+scheduler.schedule(timestamp, DriverRequest, None, driver)
+monitor.notify(timestamp, DRIVER, REQUEST, driver.id,
+driver.location)
 def __str__(self):
 """Return a string representation of pickup event
 @type self: Pickup
@@ -681,7 +3490,7 @@ return "{} -- {} -- {}: Pick up the rider".format(self.timestamp,
 self.driver,
 self.rider)
 class Dropoff(Event):
-"""The driver drops off the rider and requests a new rider
+"""The driver drops off the rider and requests for a new rider
 === Attributes ===
 @type driver: Driver
 @type rider: Rider
@@ -702,15 +3511,28 @@ def do(self, dispatcher, monitor):
 @type monitor: Monitor
 @rtype: list[Events]
 """
-events = []
-self.driver.location = self.rider.destination
-monitor.notify(self.timestamp, RIDER, DROPOFF,
-self.rider.id, self.driver.location)
-monitor.notify(self.timestamp, DRIVER, DROPOFF,
-self.driver.id, self.driver.location)
-events.append(DriverRequest(self.timestamp, self.driver))
-self.driver.is_idle = True
-dispatcher.available_drivers.append(self.driver)
+scheduler = Spawner(dispatcher, monitor)
+self.rule(scheduler, self.timestamp, self.rider, self.driver)
+return scheduler.events
+@staticmethod
+def rule(scheduler, timestamp, rider, driver):
+"""Do a Dropoff of <rider> by <driver> at <timestamp>, as described
+in do().
+@type scheduler: Spawner | EventLoop
+@type timestamp: int
+@type rider: Rider
+@type driver: Driver
+@rtype: None
+"""
+driver.location = rider.destination
+scheduler.monitor.notify(timestamp, RIDER, DROPOFF, rider.id,
+driver.location)
+scheduler.monitor.notify(timestamp, DRIVER, DROPOFF, driver.id,
+driver.location)
+# The driver is made available again directly, without a new
+# DriverRequest.
+driver.is_idle = True
+scheduler.dispatcher.add_available_driver(driver)
 def __str__(self):
 """Return a string representation of dropoff event
 @type self: Dropoff
@@ -719,6 +3541,154 @@ def __str__(self):
 return "{} -- {} -- {}: Dropoff the rider".format(self.timestamp,
 self.driver,
 self.rider)
+class MatchBatch(Event):
+"""The dispatcher matches the riders in its current batch to
+available drivers.
+"""
+def do(self, dispatcher, monitor):
+"""Match the batch, and start each matched driver driving to their
+rider.
+Return a Pickup event for each match, and another MatchBatch event
+if some riders are left for the next batch.
+@type self: MatchBatch
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: list[Event]
+"""
+scheduler = Spawner(dispatcher, monitor)
+self.rule(scheduler, self.timestamp, None, None)
+return scheduler.events
+@staticmethod
+def rule(scheduler, timestamp, rider, driver):
+"""Match the dispatcher's current batch at <timestamp>, as
+described in do(), scheduling the new events with <scheduler>.
+@type scheduler: Spawner | EventLoop
+@type timestamp: int
+@type rider: None
+@type driver: None
+@rtype: None
+"""
+dispatcher = scheduler.dispatcher
+for rider, driver in dispatcher.match_batch():
+travel_time = driver.start_drive(rider.origin)
+scheduler.track(rider, scheduler.schedule(
+timestamp + travel_time, Pickup, rider, driver))
+batch_time = dispatcher.schedule_batch(timestamp)
+if batch_time is not None:
+scheduler.schedule(batch_time, MatchBatch, None, None)
+def __str__(self):
+"""Return a string representation of this event.
+@type self: MatchBatch
+@rtype: str
+"""
+return "{} -- Match a batch of riders".format(self.timestamp)
+class Spawner:
+"""The scheduler that the rule of an Event is given when the event is
+done by its do method, which collects the events the rule schedules
+so that do can return them.
+The rule of each kind of event is the one definition of what the event
+does: an EventLoop is the other scheduler, which runs the same rules on
+compact events. A scheduler has the dispatcher and the monitor of the
+simulation, schedules events and keeps track of the pending events of
+each rider.
+=== Attributes ===
+@type dispatcher: Dispatcher
+The dispatcher of the simulation.
+@type monitor: Monitor
+The monitor of the simulation.
+@type events: list[Event]
+The events that have been scheduled, in order.
+"""
+def __init__(self, dispatcher, monitor):
+"""Initialize a Spawner that has not scheduled any events.
+@type self: Spawner
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: None
+"""
+self.dispatcher = dispatcher
+self.monitor = monitor
+self.events = []
+def schedule(self, timestamp, kind, rider, driver):
+"""Schedule a new event of class <kind> at <timestamp>, with
+<rider> and <driver> if it has them, and return it.
+@type self: Spawner
+@type timestamp: int
+@type kind: type
+@type rider: Rider | None
+@type driver: Driver | None
+@rtype: Event
+>>> spawner = Spawner(Dispatcher(), Monitor())
+>>> str(spawner.schedule(3, MatchBatch, None, None))
+'3 -- Match a batch of riders'
+>>> len(spawner.events)
+1
+"""
+event = make_event(kind, timestamp, rider, driver)
+self.events.append(event)
+return event
+def track(self, rider, event):
+"""Record that <event> is a pending Pickup or Cancellation of
+<rider>.
+@type self: Spawner
+@type rider: Rider
+@type event: Event
+@rtype: None
+"""
+self.dispatcher.track_event(rider, event)
+def cancel(self, rider):
+"""Cancel the pending events of <rider>.
+@type self: Spawner
+@type rider: Rider
+@rtype: None
+"""
+self.dispatcher.cancel_events(rider)
+def forget(self, rider):
+"""Stop tracking the pending events of <rider>, leaving them
+scheduled.
+@type self: Spawner
+@type rider: Rider
+@rtype: None
+"""
+self.dispatcher.forget_events(rider)
+EVENT_ORDER = (Dropoff, DriverRequest, RiderRequest, Cancellation, Pickup,
+MatchBatch)
+def make_event(kind, timestamp, rider, driver):
+"""Return a new event of class <kind> at <timestamp>, with <rider> and
+<driver> if it has them.
+@type kind: type
+@type timestamp: int
+@type rider: Rider | None
+@type driver: Driver | None
+@rtype: Event
+"""
+if kind is RiderRequest or kind is Cancellation:
+return kind(timestamp, rider)
+elif kind is DriverRequest:
+return kind(timestamp, driver)
+elif kind is Pickup or kind is Dropoff:
+return kind(timestamp, rider, driver)
+return MatchBatch(timestamp)
+def next_incoming(incoming, event):
+"""Return the next event from <incoming>, which comes after <event>, or
+None if there are no more.
+Raise a ValueError if the next event is earlier than <event>.
+@type incoming: iterator[Event]
+@type event: Event
+@rtype: Event | None
+>>> next_incoming(iter([Event(3)]), Event(2)).timestamp
+3
+>>> next_incoming(iter([Event(1)]), Event(2))
+Traceback (most recent call last):
+...
+ValueError: incoming events are not sorted: 1 comes after 2
+"""
+next_event = next(incoming, None)
+if next_event is not None and next_event.timestamp < event.timestamp:
+raise ValueError(
+"incoming events are not sorted: {} comes after {}".format(
+next_event.timestamp, event.timestamp))
+return next_event
 def create_event_list(filename):
 """Return a list of Events based on raw list of events in <filename>.
 Precondition: the file stored at <filename> is in the format
@@ -728,7 +3698,22 @@ by the assignment handout.
 The name of a file that contains the list of events.
 @rtype: list[Event]
 """
-events = []
+return list(read_events(filename))
+def read_events(filename, fleet=None):
+"""Yield the Events in <filename> one at a time, in the order they
+appear in the file.
+Only one line of the file is held in memory at a time, so when the
+file is sorted by timestamp the result can be passed straight to
+Simulation.run.
+If <fleet> is given, the drivers and riders are added to it, and the
+events refer to their proxies.
+Precondition: the file stored at <filename> is in the format specified
+by the assignment handout.
+@param filename: str
+The name of a file that contains the list of events.
+@param fleet: Fleet | None
+@rtype: iterator[Event]
+"""
 with open(filename, "r") as file:
 for line in file:
 line = line.strip()
@@ -748,19 +3733,151 @@ string to
 # a location.
 if event_type == "DriverRequest":
 # Create a DriverRequest event.
+if fleet is None:
 driver = Driver(tokens[2],
 deserialize_location(tokens[3]),
 int(tokens[4]))
-event = DriverRequest(timestamp, driver)
-events.append(event)
+else:
+driver = fleet.add_driver(tokens[2],
+deserialize_location(tokens[3]),
+int(tokens[4]))
+yield DriverRequest(timestamp, driver)
 elif event_type == "RiderRequest":
 # Create a RiderRequest event.
+if fleet is None:
 rider = Rider(tokens[2], deserialize_location(tokens[3]),
 deserialize_location(tokens[4]),
 int(tokens[5]))
-event = RiderRequest(timestamp, rider)
-events.append(event)
-return events
+else:
+rider = fleet.add_rider(tokens[2],
+deserialize_location(tokens[3]),
+deserialize_location(tokens[4]),
+int(tokens[5]))
+yield RiderRequest(timestamp, rider)
+"""Binary event files
+An events file in the text format read by create_event_list can be
+converted into a binary file of fixed-width records. Loading the binary
+file memory-maps it and unpacks each record in place, so there is no
+line splitting or number parsing when the same scenario is run again.
+A binary event file starts with a header, followed by one record per
+event, in file order, followed by the table of driver and rider ids.
+Records refer to ids by their index in the table, so each id is stored
+and loaded only once.
+=== Constants ===
+@type MAGIC: bytes
+The first bytes of every binary event file.
+@type HEADER: struct.Struct
+The header: MAGIC, the number of records, and the offset of the id
+table.
+@type RECORD: struct.Struct
+One event: its timestamp, its kind, the index of its id, the row and
+column of its location, the row and column of the destination (for
+RiderRequests), and the speed or patience.
+@type ID_LENGTH: struct.Struct
+The number of bytes in an entry of the id table, which come after it.
+@type DRIVER_REQUEST: int
+The kind of a DriverRequest record.
+@type RIDER_REQUEST: int
+The kind of a RiderRequest record.
+"""
+import mmap
+import struct
+from driver import Driver
+from rider import Rider
+from location import Location
+from event import DriverRequest, RiderRequest, read_events
+MAGIC = b"RSEV"
+HEADER = struct.Struct("<4sQQ")
+RECORD = struct.Struct("<qIIiiiii")
+ID_LENGTH = struct.Struct("<H")
+DRIVER_REQUEST = 0
+RIDER_REQUEST = 1
+def convert_event_file(text_filename, binary_filename):
+"""Convert the events file <text_filename> into a binary event file
+called <binary_filename>, and return the number of events converted.
+@type text_filename: str
+@type binary_filename: str
+@rtype: int
+"""
+ids = {}
+num_records = 0
+with open(binary_filename, "wb") as file:
+file.write(HEADER.pack(MAGIC, 0, 0))
+for event in read_events(text_filename):
+if isinstance(event, DriverRequest):
+driver = event.driver
+index = ids.setdefault(driver.id, len(ids))
+file.write(RECORD.pack(event.timestamp, DRIVER_REQUEST,
+index, driver.location.row,
+driver.location.column, 0, 0,
+driver.speed))
+else:
+rider = event.rider
+index = ids.setdefault(rider.id, len(ids))
+file.write(RECORD.pack(event.timestamp, RIDER_REQUEST,
+index, rider.origin.row,
+rider.origin.column,
+rider.destination.row,
+rider.destination.column,
+rider.patience))
+num_records += 1
+ids_offset = file.tell()
+for identifier in ids:
+encoded = identifier.encode("utf-8")
+file.write(ID_LENGTH.pack(len(encoded)))
+file.write(encoded)
+file.seek(0)
+file.write(HEADER.pack(MAGIC, num_records, ids_offset))
+return num_records
+def read_event_file(filename, fleet=None):
+"""Yield the Events in the binary event file <filename> one at a
+time, in the order they appeared in the original events file.
+If <fleet> is given, the drivers and riders are added to it, and the
+events refer to their proxies.
+@type filename: str
+@type fleet: Fleet | None
+@rtype: iterator[Event]
+"""
+with open(filename, "rb") as file:
+with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+magic, num_records, ids_offset = HEADER.unpack_from(data, 0)
+if magic != MAGIC:
+raise ValueError(
+"{} is not a binary event file".format(filename))
+ids = []
+offset = ids_offset
+while offset < len(data):
+length = ID_LENGTH.unpack_from(data, offset)[0]
+offset += ID_LENGTH.size
+ids.append(data[offset:offset + length].decode("utf-8"))
+offset += length
+offset = HEADER.size
+for _ in range(num_records):
+timestamp, kind, index, row, column, destination_row, \
+destination_column, value = \
+RECORD.unpack_from(data, offset)
+offset += RECORD.size
+if kind == DRIVER_REQUEST:
+if fleet is None:
+driver = Driver(ids[index], Location(row, column),
+value)
+else:
+driver = fleet.add_driver(ids[index],
+Location(row, column),
+value)
+yield DriverRequest(timestamp, driver)
+else:
+origin = Location(row, column)
+destination = Location(destination_row,
+destination_column)
+if fleet is None:
+rider = Rider(ids[index], origin, destination, value)
+else:
+rider = fleet.add_rider(ids[index], origin,
+destination, value)
+yield RiderRequest(timestamp, rider)
+if __name__ == "__main__":
+convert_event_file("events.txt", "events.bin")
 # Sample Event List
 # The parser will skip empty lines, lines with whitespace only,
 # or those that start with '#'.
@@ -790,10 +3907,265 @@ return events
 #Arnold is at location 3,3, requests a rider,
 #and Arnold's car moves 2 units of distance per unit time
 10 DriverRequest Arnold 3,3 2
+"""Fleet storage
+The Fleet class stores the state of drivers and riders column by column
+in arrays, instead of in one Python object each. DriverProxy and
+RiderProxy are thin Driver and Rider subclasses that read and write a
+Fleet, so the existing Dispatcher, events and Monitor work with them
+unchanged.
+The arrays take about half the memory of Driver objects, but each proxy
+is a full object with an instance dictionary, inherited from Driver and
+Rider: a proxy that is kept alive costs more than the state it points
+to. A Fleet saves memory only while few proxies are held at once, when
+they are made as they are needed, as Fleet.driver and Fleet.rider do,
+rather than kept for each driver and rider.
+=== Constants ===
+@type STATUSES: tuple[str]
+The rider statuses, in the order of their codes in a Fleet.
+"""
+from array import array
+from driver import Driver
+from rider import Rider, WAITING, CANCELLED, SATISFIED
+from location import Location
+STATUSES = (WAITING, CANCELLED, SATISFIED)
+class Fleet:
+"""The drivers and riders of a simulation, stored in arrays.
+Drivers and riders are numbered in the order they are added, and
+their state is found at that index in each array.
+=== Attributes ===
+@type driver_ids: list[str]
+The identifier of each driver.
+@type driver_rows: array[int]
+@type driver_columns: array[int]
+The location of each driver.
+@type speeds: array[int]
+The speed of each driver.
+@type idle: array[int]
+1 if the driver is idle and 0 otherwise.
+@type drive_rows: array[int]
+@type drive_columns: array[int]
+The location each driver is driving to, if any.
+@type ride_rows: array[int]
+@type ride_columns: array[int]
+The destination of the ride each driver is on, if any.
+@type destinations: array[int]
+For each driver, 1 if they have a location they are driving to
+plus 2 if they have a ride destination.
+@type rider_ids: list[str]
+The identifier of each rider.
+@type origin_rows: array[int]
+@type origin_columns: array[int]
+The origin of each rider.
+@type destination_rows: array[int]
+@type destination_columns: array[int]
+The destination of each rider.
+@type patiences: array[int]
+The patience of each rider.
+@type statuses: array[int]
+The index in STATUSES of the status of each rider.
+"""
+def __init__(self):
+"""Initialize an empty Fleet.
+@type self: Fleet
+@rtype: None
+"""
+self.driver_ids = []
+self.driver_rows = array("i")
+self.driver_columns = array("i")
+self.speeds = array("i")
+self.idle = array("b")
+self.drive_rows = array("i")
+self.drive_columns = array("i")
+self.ride_rows = array("i")
+self.ride_columns = array("i")
+self.destinations = array("b")
+self.rider_ids = []
+self.origin_rows = array("i")
+self.origin_columns = array("i")
+self.destination_rows = array("i")
+self.destination_columns = array("i")
+self.patiences = array("i")
+self.statuses = array("b")
+def add_driver(self, identifier, location, speed):
+"""Add an idle driver to this Fleet and return a proxy for them.
+@type self: Fleet
+@type identifier: str
+@type location: Location
+@type speed: int
+@rtype: DriverProxy
+>>> fleet = Fleet()
+>>> d = fleet.add_driver("D", Location(0, 0), 1)
+>>> d.start_drive(Location(10, 11))
+21
+>>> d.end_drive()
+>>> print(fleet.driver(0))
+D 10,11 1
+>>> d.is_idle
+False
+"""
+self.driver_ids.append(identifier)
+self.driver_rows.append(location.row)
+self.driver_columns.append(location.column)
+self.speeds.append(speed)
+self.idle.append(1)
+self.drive_rows.append(0)
+self.drive_columns.append(0)
+self.ride_rows.append(0)
+self.ride_columns.append(0)
+self.destinations.append(0)
+return DriverProxy(self, len(self.driver_ids) - 1)
+def add_rider(self, identifier, origin, destination, patience):
+"""Add a waiting rider to this Fleet and return a proxy for them.
+@type self: Fleet
+@type identifier: str
+@type origin: Location
+@type destination: Location
+@type patience: int
+@rtype: RiderProxy
+>>> fleet = Fleet()
+>>> r = fleet.add_rider("R", Location(1, 2), Location(3, 4), 12)
+>>> r.status = SATISFIED
+>>> print(r)
+R 1,2 3,4 12
+>>> fleet.rider(0).status
+'satisfied'
+"""
+self.rider_ids.append(identifier)
+self.origin_rows.append(origin.row)
+self.origin_columns.append(origin.column)
+self.destination_rows.append(destination.row)
+self.destination_columns.append(destination.column)
+self.patiences.append(patience)
+self.statuses.append(STATUSES.index(WAITING))
+return RiderProxy(self, len(self.rider_ids) - 1)
+def driver(self, index):
+"""Return a proxy for the driver at <index>.
+@type self: Fleet
+@type index: int
+@rtype: DriverProxy
+"""
+return DriverProxy(self, index)
+def rider(self, index):
+"""Return a proxy for the rider at <index>.
+@type self: Fleet
+@type index: int
+@rtype: RiderProxy
+"""
+return RiderProxy(self, index)
+def num_drivers(self):
+"""Return the number of drivers in this Fleet.
+@type self: Fleet
+@rtype: int
+"""
+return len(self.driver_ids)
+def num_riders(self):
+"""Return the number of riders in this Fleet.
+@type self: Fleet
+@rtype: int
+"""
+return len(self.rider_ids)
+class DriverProxy(Driver):
+"""A driver whose state is stored in a Fleet.
+A DriverProxy has the attributes and methods of a Driver, and any
+number of proxies for the same index share one driver.
+"""
+def __init__(self, fleet, index):
+"""Initialize a proxy for the driver at <index> in <fleet>.
+@type self: DriverProxy
+@type fleet: Fleet
+@type index: int
+@rtype: None
+"""
+self._fleet = fleet
+self._index = index
+@property
+def id(self):
+return self._fleet.driver_ids[self._index]
+@property
+def location(self):
+return Location(self._fleet.driver_rows[self._index],
+self._fleet.driver_columns[self._index])
+@location.setter
+def location(self, location):
+self._fleet.driver_rows[self._index] = location.row
+self._fleet.driver_columns[self._index] = location.column
+@property
+def speed(self):
+return self._fleet.speeds[self._index]
+@property
+def is_idle(self):
+return self._fleet.idle[self._index] == 1
+@is_idle.setter
+def is_idle(self, is_idle):
+self._fleet.idle[self._index] = 1 if is_idle else 0
+@property
+def _loc_end_drive(self):
+if self._fleet.destinations[self._index] & 1 == 0:
+return None
+return Location(self._fleet.drive_rows[self._index],
+self._fleet.drive_columns[self._index])
+@_loc_end_drive.setter
+def _loc_end_drive(self, location):
+self._fleet.drive_rows[self._index] = location.row
+self._fleet.drive_columns[self._index] = location.column
+self._fleet.destinations[self._index] |= 1
+@property
+def _loc_end_ride(self):
+if self._fleet.destinations[self._index] & 2 == 0:
+return None
+return Location(self._fleet.ride_rows[self._index],
+self._fleet.ride_columns[self._index])
+@_loc_end_ride.setter
+def _loc_end_ride(self, location):
+self._fleet.ride_rows[self._index] = location.row
+self._fleet.ride_columns[self._index] = location.column
+self._fleet.destinations[self._index] |= 2
+class RiderProxy(Rider):
+"""A rider whose state is stored in a Fleet.
+A RiderProxy has the attributes and methods of a Rider, and any
+number of proxies for the same index share one rider.
+"""
+def __init__(self, fleet, index):
+"""Initialize a proxy for the rider at <index> in <fleet>.
+@type self: RiderProxy
+@type fleet: Fleet
+@type index: int
+@rtype: None
+"""
+self._fleet = fleet
+self._index = index
+@property
+def id(self):
+return self._fleet.rider_ids[self._index]
+@property
+def origin(self):
+return Location(self._fleet.origin_rows[self._index],
+self._fleet.origin_columns[self._index])
+@property
+def destination(self):
+return Location(self._fleet.destination_rows[self._index],
+self._fleet.destination_columns[self._index])
+@property
+def patience(self):
+return self._fleet.patiences[self._index]
+@property
+def status(self):
+return STATUSES[self._fleet.statuses[self._index]]
+@status.setter
+def status(self, status):
+self._fleet.statuses[self._index] = STATUSES.index(status)
+from weakref import WeakValueDictionary
+# The Location at each (row, column) that is still in use. A location is
+# dropped from the table once nothing else refers to it.
+_locations = WeakValueDictionary()
 class Location:
 """
 Our simulation plays out on a simplified grid of city blocks.
 Each location is specified by a pair of (row, column)
+Locations are immutable and interned: creating a Location at a
+(row, column) that already has one returns the existing object, so
+each grid point in use is stored once and equal locations are
+identical.
 Attribute:
 ==========
 @type row: non-negative integer
@@ -801,15 +4173,56 @@ number of blocks from the bottom
 @type column: non-negative integer
 number of blocks from the left
 """
-def __init__(self, row, column):
-"""Initialize a location.
-@type self: Location
+__slots__ = ("row", "column", "__weakref__")
+def __new__(cls, row, column):
+"""Return the location at <row> and <column>.
+Coordinates that are whole numbers of another type, such as 2.0,
+are converted to int; other coordinates raise a ValueError.
+@type cls: type
 @type row: int
 @type column: int
+@rtype: Location
+>>> Location(2, 3) is Location(2, 3)
+True
+>>> type(Location(2.0, 3).row)
+<class 'int'>
+>>> Location(2.5, 3)
+Traceback (most recent call last):
+...
+ValueError: the coordinates of a location must be integers
+>>> Location(2, 3).row = 4
+Traceback (most recent call last):
+...
+AttributeError: Location is immutable
+"""
+if type(row) is not int or type(column) is not int:
+if int(row) != row or int(column) != column:
+raise ValueError(
+"the coordinates of a location must be integers")
+row = int(row)
+column = int(column)
+location = _locations.get((row, column))
+if location is None:
+location = object.__new__(cls)
+object.__setattr__(location, "row", row)
+object.__setattr__(location, "column", column)
+_locations[(row, column)] = location
+return location
+def __setattr__(self, name, value):
+"""Raise an AttributeError, since a Location cannot change.
+@type self: Location
+@type name: str
+@type value: object
 @rtype: None
 """
-self.row = row
-self.column = column
+raise AttributeError("Location is immutable")
+def __reduce__(self):
+"""Return how to pickle this location, so that it is interned
+again when it is unpickled.
+@type self: Location
+@rtype: (type, (int, int))
+"""
+return Location, (self.row, self.column)
 def __str__(self):
 """Return a string representation.
 @type self: Location
@@ -832,9 +4245,13 @@ True
 >>> l1 == l3
 False
 """
-return (type(self) == type(other) and
-self.column == other.column and
-self.row == other.row)
+return self is other
+def __hash__(self):
+"""Return a hash of this location.
+@type self: Location
+@rtype: int
+"""
+return hash((self.row, self.column))
 def manhattan_distance(origin, destination):
 """Return the Manhattan distance between the origin and the
 destination.
@@ -846,6 +4263,8 @@ destination.
 >>> manhattan_distance(Location(2,3),Location(2,7))
 4
 """
+if origin is destination:
+return 0
 return (abs(origin.column - destination.column) +
 abs(origin.row - destination.row))
 def deserialize_location(location_str):
@@ -860,14 +4279,228 @@ A location in the format 'row,col'
 >>> print(d2)
 6,4
 """
-l = Location(0, 0)
 index_comma = location_str.find(',')
-l.row = int(location_str[:index_comma])
-l.column = int(location_str[index_comma+1:])
-return l
+return Location(int(location_str[:index_comma]),
+int(location_str[index_comma+1:]))
 if __name__ == "__main__":
 import doctest
 doctest.testmod()
+"""Memory accounting
+A MemorySampler measures the memory used by each component of a
+simulation at regular intervals of simulation time: the event queue,
+the waiting riders, the available drivers and the monitor, along with
+the number of live Rider, Driver and Location objects and, optionally,
+the totals traced by tracemalloc.
+Counting the live objects walks every object the garbage collector
+tracks, so it takes time in the size of the whole heap; it is only done
+for some of the samples.
+A Simulation only uses a MemorySampler when it is given one, and its
+samples are read from it once the simulation has run.
+=== Constants ===
+@type COMPONENTS: tuple[str]
+The components measured in each sample.
+"""
+import gc
+import sys
+import tracemalloc
+from types import FunctionType, ModuleType
+from rider import Rider
+from driver import Driver
+from location import Location
+COMPONENTS = ("queue", "waiting_riders", "available_drivers", "monitor")
+def deep_size(obj, exclude=()):
+"""Return the number of bytes used by <obj> and every object it
+refers to, directly or indirectly, except for classes, functions and
+modules.
+Each object is counted once, however many times it is referred to.
+The objects in <exclude> are neither counted nor followed, so that
+references back to a container, such as from the handle of an event
+to its queue, or to storage shared with other objects, such as the
+Fleet of a proxy, do not pull them in.
+@type obj: object
+@type exclude: list | tuple
+@rtype: int
+>>> deep_size([]) < deep_size([Location(1, 2)])
+True
+>>> deep_size([Location(1, 2)]) == deep_size([Location(1, 2)] * 2) - 8
+True
+>>> shared = [Location(3, 4)]
+>>> outer = deep_size([shared]) - deep_size(shared)
+>>> deep_size([shared], [shared]) == outer
+True
+"""
+seen = {id(item) for item in exclude}
+size = 0
+stack = [obj]
+while stack:
+item = stack.pop()
+if id(item) in seen or \
+isinstance(item, (type, FunctionType, ModuleType)):
+continue
+seen.add(id(item))
+size += sys.getsizeof(item)
+stack.extend(gc.get_referents(item))
+return size
+class MemorySampler:
+"""A time series of the memory used by the components of a
+simulation.
+=== Attributes ===
+@type interval: int
+The simulation time between samples.
+@type budgets: dict[str, int]
+The largest number of bytes each component may use before it is
+over budget, by component.
+@type census_interval: int
+The number of samples between counts of the live objects. The
+first and last samples always count them.
+@type shared: list[object]
+Objects that the components share, such as a Fleet, which are
+left out of the size of each component and measured on their own.
+@type samples: list[dict[str, int]]
+The samples, in order. Each sample has the simulation "time", the
+bytes used by each of COMPONENTS and by the "shared" objects, and,
+if tracing, the "traced" and "traced_peak" bytes of tracemalloc.
+Samples that count the live objects also have the number of live
+"riders", "drivers" and "locations".
+"""
+# === Private Attributes ===
+# @type _trace: bool
+# Whether tracemalloc totals are sampled.
+# @type _started: bool
+# Whether tracemalloc was started by this sampler.
+# @type _next_time: int
+# The simulation time of the next sample.
+# @type _last_time: int
+# The last simulation time observed.
+def __init__(self, interval=100, budgets=None, trace=False,
+census_interval=10, shared=None):
+"""Initialize a MemorySampler with no samples.
+@type self: MemorySampler
+@type interval: int
+@type budgets: dict[str, int] | None
+@type trace: bool
+Whether to sample the totals of tracemalloc, starting it if it
+is not already tracing.
+@type census_interval: int
+@type shared: list[object] | None
+@rtype: None
+"""
+self.interval = interval
+if budgets is None:
+budgets = {}
+self.budgets = budgets
+self.census_interval = census_interval
+if shared is None:
+shared = []
+self.shared = shared
+self.samples = []
+self._trace = trace
+self._started = False
+self._next_time = 0
+self._last_time = 0
+def observe(self, timestamp, queue, dispatcher, monitor):
+"""Take a sample if the simulation has reached the time of the next
+one.
+@type self: MemorySampler
+@type timestamp: int
+@type queue: Container | None
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: None
+"""
+self._last_time = timestamp
+if timestamp >= self._next_time:
+self.sample(timestamp, queue, dispatcher, monitor)
+self._next_time = timestamp - timestamp % self.interval + \
+self.interval
+def sample(self, timestamp, queue, dispatcher, monitor, census=None):
+"""Measure the components now, and add the sample.
+<queue> is None if the event queue cannot be measured; its size is
+then recorded as 0.
+The live objects are counted if <census> is True, or, if it is
+None, when census_interval samples have been taken since they were
+last counted.
+Components that refer to the same objects each count them, except
+for the shared objects. No component counts the queue, the
+dispatcher or the monitor as part of another.
+@type self: MemorySampler
+@type timestamp: int
+@type queue: Container | None
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@type census: bool | None
+@rtype: None
+>>> from container import PriorityQueue
+>>> from dispatcher import Dispatcher
+>>> from monitor import Monitor
+>>> sampler = MemorySampler(census_interval=2)
+>>> for time in range(3):
+...     sampler.sample(time, PriorityQueue(), Dispatcher(),
+...                    Monitor())
+>>> ["riders" in sample for sample in sampler.samples]
+[True, False, True]
+"""
+if self._trace and not tracemalloc.is_tracing():
+tracemalloc.start()
+self._started = True
+if census is None:
+census = len(self.samples) % self.census_interval == 0
+shared = self.shared
+everything = shared + [queue, dispatcher, monitor]
+sample = {"time": timestamp,
+"queue": 0 if queue is None else
+deep_size(queue, shared + [dispatcher, monitor]),
+"waiting_riders":
+deep_size(dispatcher.waiting_riders, everything),
+"available_drivers":
+deep_size(dispatcher.available_drivers, everything),
+"monitor": deep_size(monitor, shared + [queue, dispatcher]),
+"shared": deep_size(shared)}
+if census:
+sample["riders"] = 0
+sample["drivers"] = 0
+sample["locations"] = 0
+for obj in gc.get_objects():
+if isinstance(obj, Rider):
+sample["riders"] += 1
+elif isinstance(obj, Driver):
+sample["drivers"] += 1
+elif isinstance(obj, Location):
+sample["locations"] += 1
+if self._trace:
+sample["traced"], sample["traced_peak"] = \
+tracemalloc.get_traced_memory()
+self.samples.append(sample)
+def finish(self, queue, dispatcher, monitor):
+"""Take a final sample at the last time observed, counting the
+live objects, and stop tracemalloc if this sampler started it.
+@type self: MemorySampler
+@type queue: Container | None
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@rtype: None
+"""
+self.sample(self._last_time, queue, dispatcher, monitor, True)
+if self._started:
+tracemalloc.stop()
+self._started = False
+def over_budget(self):
+"""Return the samples in which a component used more memory than
+its budget, as (time, component, bytes) tuples.
+@type self: MemorySampler
+@rtype: list[(int, str, int)]
+>>> sampler = MemorySampler(budgets={"queue": 100})
+>>> sampler.samples = [{"time": 0, "queue": 50},
+...                    {"time": 10, "queue": 150}]
+>>> sampler.over_budget()
+[(10, 'queue', 150)]
+"""
+return [(sample["time"], component, sample[component])
+for sample in self.samples
+for component, budget in self.budgets.items()
+if sample.get(component, 0) > budget]
+from array import array
+from itertools import repeat
 from location import Location
 from location import manhattan_distance
 """
@@ -890,6 +4523,11 @@ A constant used for the cancel activity description.
 A constant used for the pickup activity description.
 @type DROPOFF: str
 A constant used for the dropoff activity description.
+@type CATEGORIES: tuple[str]
+The activity categories, in the order of their codes in an ActivityLog.
+@type DESCRIPTIONS: tuple[str]
+The activity descriptions, in the order of their codes in an
+ActivityLog.
 """
 RIDER = "rider"
 DRIVER = "driver"
@@ -897,6 +4535,8 @@ REQUEST = "request"
 CANCEL = "cancel"
 PICKUP = "pickup"
 DROPOFF = "dropoff"
+CATEGORIES = (RIDER, DRIVER)
+DESCRIPTIONS = (REQUEST, CANCEL, PICKUP, DROPOFF)
 class Activity:
 """An activity that occurs in the simulation.
 === Attributes ===
@@ -922,6 +4562,179 @@ self.description = description
 self.time = timestamp
 self.id = identifier
 self.location = location
+class ActivityLog:
+"""A record of activities, stored column by column in arrays.
+Each activity takes a few bytes in every column, rather than an
+Activity object and a Location object. Identifiers are stored once
+each, and activities refer to them by index.
+=== Attributes ===
+@type times: array[int]
+The time of each activity.
+@type categories: array[int]
+The index in CATEGORIES of the category of each activity.
+@type descriptions: array[int]
+The index in DESCRIPTIONS of the description of each activity.
+@type ids: array[int]
+The index of the identifier of each activity.
+@type rows: array[int]
+The row of the location of each activity.
+@type columns: array[int]
+The column of the location of each activity.
+"""
+# === Private Attributes ===
+# @type _names: list[str]
+# The identifiers, by index.
+# @type _indices: dict[str, int]
+# The index of each identifier.
+def __init__(self):
+"""Initialize an empty ActivityLog.
+@type self: ActivityLog
+@rtype: None
+"""
+self.times = array("q")
+self.categories = array("b")
+self.descriptions = array("b")
+self.ids = array("i")
+self.rows = array("i")
+self.columns = array("i")
+self._names = []
+self._indices = {}
+def __len__(self):
+"""Return the number of activities in this ActivityLog.
+@type self: ActivityLog
+@rtype: int
+"""
+return len(self.times)
+def __getitem__(self, index):
+"""Return a view of the activity at <index>.
+@type self: ActivityLog
+@type index: int
+@rtype: ActivityView
+>>> log = ActivityLog()
+>>> log.append(4, DRIVER, PICKUP, "Chris", Location(10, 2))
+>>> activity = log[0]
+>>> activity.time, activity.description, activity.id
+(4, 'pickup', 'Chris')
+>>> print(activity.location)
+10,2
+"""
+return ActivityView(self, index)
+def append(self, timestamp, category, description, identifier,
+location):
+"""Add an activity to the end of this ActivityLog.
+@type self: ActivityLog
+@type timestamp: int
+@type category: DRIVER | RIDER
+@type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+@type identifier: str
+@type location: Location
+@rtype: None
+"""
+index = self._indices.get(identifier)
+if index is None:
+index = len(self._names)
+self._indices[identifier] = index
+self._names.append(identifier)
+self.times.append(timestamp)
+self.categories.append(CATEGORIES.index(category))
+self.descriptions.append(DESCRIPTIONS.index(description))
+self.ids.append(index)
+self.rows.append(location.row)
+self.columns.append(location.column)
+def extend(self, timestamp, category, description, identifiers,
+locations):
+"""Add an activity for each identifier in <identifiers>, at the
+location with the same index in <locations>, to the end of this
+ActivityLog.
+@type self: ActivityLog
+@type timestamp: int
+@type category: DRIVER | RIDER
+@type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+@type identifiers: list[str]
+@type locations: list[Location]
+@rtype: None
+>>> log = ActivityLog()
+>>> log.extend(4, DRIVER, REQUEST, ["A", "B"],
+...            [Location(1, 2), Location(3, 4)])
+>>> len(log), log[1].id, log[1].time
+(2, 'B', 4)
+"""
+indices = self._indices
+for identifier in identifiers:
+if identifier not in indices:
+indices[identifier] = len(self._names)
+self._names.append(identifier)
+count = len(identifiers)
+self.times.extend(repeat(timestamp, count))
+self.categories.extend(repeat(CATEGORIES.index(category), count))
+self.descriptions.extend(repeat(DESCRIPTIONS.index(description),
+count))
+self.ids.extend(map(indices.__getitem__, identifiers))
+self.rows.extend(location.row for location in locations)
+self.columns.extend(location.column for location in locations)
+def name(self, index):
+"""Return the identifier with index <index>.
+@type self: ActivityLog
+@type index: int
+@rtype: str
+"""
+return self._names[index]
+def write_state(self, writer):
+"""Write the columns and identifiers of this ActivityLog to
+<writer>.
+@type self: ActivityLog
+@type writer: CheckpointWriter
+@rtype: None
+"""
+for column in (self.times, self.categories, self.descriptions,
+self.ids, self.rows, self.columns):
+writer.write_array(column)
+writer.write_strings(self._names)
+def read_state(self, reader):
+"""Replace the activities of this ActivityLog with the ones read
+from <reader>, as written by write_state.
+@type self: ActivityLog
+@type reader: CheckpointReader
+@rtype: None
+"""
+self.times = reader.read_array()
+self.categories = reader.read_array()
+self.descriptions = reader.read_array()
+self.ids = reader.read_array()
+self.rows = reader.read_array()
+self.columns = reader.read_array()
+self._names = reader.read_strings()
+self._indices = {name: index
+for index, name in enumerate(self._names)}
+class ActivityView:
+"""A view of one activity in an ActivityLog, with the same attributes
+as an Activity.
+=== Attributes ===
+@type index: int
+The position of the activity in the log.
+"""
+def __init__(self, log, index):
+"""Initialize a view of the activity at <index> in <log>.
+@type self: ActivityView
+@type log: ActivityLog
+@type index: int
+@rtype: None
+"""
+self._log = log
+self.index = index
+@property
+def time(self):
+return self._log.times[self.index]
+@property
+def description(self):
+return DESCRIPTIONS[self._log.descriptions[self.index]]
+@property
+def id(self):
+return self._log.name(self._log.ids[self.index])
+@property
+def location(self):
+return Location(self._log.rows[self.index],
+self._log.columns[self.index])
 class Monitor:
 """A monitor keeps a record of activities that it is notified about.
 When required, it generates a report of the activities it has
@@ -981,6 +4794,73 @@ if identifier not in self._activities[category]:
 self._activities[category][identifier] = []
 activity = Activity(timestamp, description, identifier, location)
 self._activities[category][identifier].append(activity)
+def notify_all(self, timestamp, category, description, identifiers,
+locations):
+"""Notify the monitor of the same activity by each actor in
+<identifiers>, at the location with the same index in <locations>.
+@type self: Monitor
+@type timestamp: int
+@type category: DRIVER | RIDER
+@type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+@type identifiers: list[str]
+@type locations: list[Location]
+@rtype: None
+"""
+for identifier, location in zip(identifiers, locations):
+self.notify(timestamp, category, description, identifier,
+location)
+def write_state(self, writer):
+"""Write the activities recorded by this monitor to <writer>.
+@type self: Monitor
+@type writer: CheckpointWriter
+@rtype: None
+"""
+writer.write_strings([type(self).__name__])
+for category in CATEGORIES:
+actors = self._activities[category]
+activities = [activity for record in actors.values()
+for activity in record]
+writer.write_strings(list(actors))
+writer.write_ints(len(record) for record in actors.values())
+writer.write_ints(activity.time for activity in activities)
+writer.write_ints((DESCRIPTIONS.index(activity.description)
+for activity in activities), "b")
+writer.write_locations([activity.location
+for activity in activities])
+def read_state(self, reader):
+"""Replace the activities recorded by this monitor with the ones
+read from <reader>, as written by write_state.
+@type self: Monitor
+@type reader: CheckpointReader
+@rtype: None
+"""
+self._check_state(reader)
+for category in CATEGORIES:
+identifiers = reader.read_strings()
+counts = reader.read_array()
+times = reader.read_array()
+descriptions = reader.read_array()
+locations = reader.read_locations()
+actors = self._activities[category] = {}
+start = 0
+for identifier, count in zip(identifiers, counts):
+actors[identifier] = [
+Activity(times[i], DESCRIPTIONS[descriptions[i]],
+identifier, locations[i])
+for i in range(start, start + count)]
+start += count
+def _check_state(self, reader):
+"""Read the class of the monitor whose state was written to
+<reader>, and raise a ValueError if it is not the class of this
+monitor.
+@type self: Monitor
+@type reader: CheckpointReader
+@rtype: None
+"""
+name = reader.read_strings()[0]
+if name != type(self).__name__:
+raise ValueError("cannot restore the state of {} into {}"
+.format(name, type(self).__name__))
 def report(self):
 """Return a report of the activities that have occurred.
 @type self: Monitor
@@ -1075,9 +4955,8 @@ def _average_ride_distance(self):
 ride_distance = 0
 num_drivers = len(self._activities[DRIVER])
 for activities in self._activities[DRIVER].values():
-for activity in activities:
+for i, activity in enumerate(activities):
 if activity.description == PICKUP:
-i = activities.index(activity)
 ride_distance += manhattan_distance(
 activities[i + 1].location,
 activities[i].location)
@@ -1085,6 +4964,817 @@ return ride_distance / num_drivers
 @property
 def average_ride_distance(self):
 return self._average_ride_distance()
+class AggregateMonitor(Monitor):
+"""A monitor that keeps running totals instead of a record of every
+activity.
+The totals are updated as each activity is notified, so report() does
+not depend on the length of the simulation, and only the riders that
+are still waiting or riding and the last location of each driver are
+kept in memory. The report is the same as the one a Monitor would
+produce.
+"""
+# === Private Attributes ===
+# @type _num_riders: int
+# The number of riders that have been notified about.
+# @type _wait_time: int
+# The total wait time of riders that have been picked up or have
+# cancelled.
+# @type _num_waits: int
+# The number of riders that have been picked up or have cancelled.
+# @type _requests: dict[str, int]
+# The time each waiting rider made their request, by id.
+# @type _riding: set[str]
+# The ids of the riders that have been picked up but not dropped
+# off.
+# @type _driver_locations: dict[str, Location]
+# The location of the last activity of each driver, by id.
+# @type _pickups: set[str]
+# The ids of the drivers whose last activity was a pickup.
+# @type _total_distance: int
+# The total distance between consecutive activities of drivers.
+# @type _ride_distance: int
+# The total distance from a pickup to the next activity of the
+# same driver.
+def __init__(self):
+"""Initialize an AggregateMonitor.
+@type self: AggregateMonitor
+"""
+Monitor.__init__(self)
+self._num_riders = 0
+self._wait_time = 0
+self._num_waits = 0
+self._requests = {}
+self._riding = set()
+self._driver_locations = {}
+self._pickups = set()
+self._total_distance = 0
+self._ride_distance = 0
+def __str__(self):
+"""Return a string representation.
+@type self: AggregateMonitor
+@rtype: str
+>>> m = AggregateMonitor()
+>>> m.notify(1, RIDER, REQUEST, "Chen", Location(3, 3))
+>>> m.notify(1, DRIVER, REQUEST, "Chris", Location(0, 0))
+>>> print(m)
+Monitor (1 drivers, 1 riders)
+"""
+return "Monitor ({} drivers, {} riders)".format(
+len(self._driver_locations), self._num_riders)
+def notify(self, timestamp, category, description, identifier,
+location):
+"""Notify the monitor of the activity.
+@type self: AggregateMonitor
+@type timestamp: int
+The time of the activity.
+@type category: DRIVER | RIDER
+The category for the activity.
+@type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+A description of the activity.
+@type identifier: str
+The identifier for the actor.
+@type location: Location
+The location of the activity.
+@rtype: None
+>>> m = AggregateMonitor()
+>>> m.notify(1, RIDER, REQUEST, "Chris", Location(0, 0))
+>>> m.notify(3, RIDER, PICKUP, "Chris", Location(10, 2))
+>>> m.notify(2, RIDER, REQUEST, "Chen", Location(3, 3))
+>>> m.notify(6, RIDER, CANCEL, "Chen", Location(3, 3))
+>>> m.notify(2, DRIVER, REQUEST, "Chen", Location(3, 3))
+>>> m.notify(6, DRIVER, PICKUP, "Chen", Location(4, 0))
+>>> m.notify(10, DRIVER, DROPOFF, "Chen", Location(13, 20))
+>>> m.report()
+{'rider_wait_time': 3.0, 'driver_total_distance': 33.0, \
+'driver_ride_distance': 29.0}
+"""
+if category == RIDER:
+if identifier in self._requests:
+self._wait_time += timestamp - self._requests.pop(identifier)
+self._num_waits += 1
+if description == PICKUP:
+self._riding.add(identifier)
+elif identifier in self._riding:
+self._riding.remove(identifier)
+else:
+self._num_riders += 1
+self._requests[identifier] = timestamp
+else:
+if identifier in self._driver_locations:
+distance = manhattan_distance(
+location, self._driver_locations[identifier])
+self._total_distance += distance
+if identifier in self._pickups:
+self._ride_distance += distance
+self._pickups.remove(identifier)
+self._driver_locations[identifier] = location
+if description == PICKUP:
+self._pickups.add(identifier)
+def write_state(self, writer):
+"""Write the totals of this monitor, and the riders and drivers it
+is keeping track of, to <writer>.
+@type self: AggregateMonitor
+@type writer: CheckpointWriter
+@rtype: None
+"""
+writer.write_strings([type(self).__name__])
+writer.write_ints([self._num_riders, self._wait_time,
+self._num_waits, self._total_distance,
+self._ride_distance])
+writer.write_strings(list(self._requests))
+writer.write_ints(self._requests.values())
+writer.write_strings(list(self._riding))
+writer.write_strings(list(self._driver_locations))
+writer.write_locations(list(self._driver_locations.values()))
+writer.write_strings(list(self._pickups))
+def read_state(self, reader):
+"""Replace the state of this monitor with the state read from
+<reader>, as written by write_state.
+@type self: AggregateMonitor
+@type reader: CheckpointReader
+@rtype: None
+"""
+self._check_state(reader)
+self._num_riders, self._wait_time, self._num_waits, \
+self._total_distance, self._ride_distance = reader.read_array()
+self._requests = dict(zip(reader.read_strings(),
+reader.read_array()))
+self._riding = set(reader.read_strings())
+self._driver_locations = dict(zip(reader.read_strings(),
+reader.read_locations()))
+self._pickups = set(reader.read_strings())
+def _average_wait_time(self):
+"""Return the average wait time of riders that have either been
+picked up or have cancelled their ride.
+@type self: AggregateMonitor
+@rtype: float
+"""
+return self._wait_time / self._num_waits
+def _average_total_distance(self):
+"""Return the average distance drivers have driven.
+@type self: AggregateMonitor
+@rtype: float
+"""
+return self._total_distance / len(self._driver_locations)
+def _average_ride_distance(self):
+"""Return the average distance drivers have driven on rides.
+@type self: AggregateMonitor
+@rtype: float
+"""
+return self._ride_distance / len(self._driver_locations)
+class ColumnarMonitor(Monitor):
+"""A monitor that records every activity in an ActivityLog.
+It keeps the full record of a Monitor in a fraction of the memory.
+Its report has the same statistics as the report of a Monitor, and the
+full record also gives percentiles of the rider wait time.
+"""
+# === Private Attributes ===
+# @type _log: ActivityLog
+# The activities, in the order they were notified.
+# @type _actors: dict[str, set[str]]
+# The identifiers that have been notified about, by category.
+def __init__(self):
+"""Initialize a ColumnarMonitor.
+@type self: ColumnarMonitor
+"""
+self._log = ActivityLog()
+self._actors = {
+RIDER: set(),
+DRIVER: set()
+}
+def __str__(self):
+"""Return a string representation.
+@type self: ColumnarMonitor
+@rtype: str
+>>> m = ColumnarMonitor()
+>>> m.notify(1, RIDER, REQUEST, "Chen", Location(3, 3))
+>>> m.notify(1, DRIVER, REQUEST, "Chris", Location(0, 0))
+>>> m.notify(2, DRIVER, REQUEST, "Louis", Location(0, 0))
+>>> print(m)
+Monitor (2 drivers, 1 riders)
+"""
+return "Monitor ({} drivers, {} riders)".format(
+len(self._actors[DRIVER]),
+len(self._actors[RIDER]))
+def notify(self, timestamp, category, description, identifier,
+location):
+"""Notify the monitor of the activity.
+@type self: ColumnarMonitor
+@type timestamp: int
+The time of the activity.
+@type category: DRIVER | RIDER
+The category for the activity.
+@type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+A description of the activity.
+@type identifier: str
+The identifier for the actor.
+@type location: Location
+The location of the activity.
+@rtype: None
+"""
+self._actors[category].add(identifier)
+self._log.append(timestamp, category, description, identifier,
+location)
+def notify_all(self, timestamp, category, description, identifiers,
+locations):
+"""Notify the monitor of the same activity by each actor in
+<identifiers>, at the location with the same index in <locations>.
+@type self: ColumnarMonitor
+@type timestamp: int
+@type category: DRIVER | RIDER
+@type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+@type identifiers: list[str]
+@type locations: list[Location]
+@rtype: None
+"""
+self._actors[category].update(identifiers)
+self._log.extend(timestamp, category, description, identifiers,
+locations)
+def write_state(self, writer):
+"""Write the activities recorded by this monitor to <writer>.
+@type self: ColumnarMonitor
+@type writer: CheckpointWriter
+@rtype: None
+"""
+writer.write_strings([type(self).__name__])
+self._log.write_state(writer)
+for category in CATEGORIES:
+writer.write_strings(list(self._actors[category]))
+def read_state(self, reader):
+"""Replace the activities recorded by this monitor with the ones
+read from <reader>, as written by write_state.
+@type self: ColumnarMonitor
+@type reader: CheckpointReader
+@rtype: None
+"""
+self._check_state(reader)
+self._log.read_state(reader)
+for category in CATEGORIES:
+self._actors[category] = set(reader.read_strings())
+@property
+def _activities(self):
+"""Return views of the recorded activities, grouped the same way as
+the activities of a Monitor.
+@type self: ColumnarMonitor
+@rtype: dict[str, dict[str, list[ActivityView]]]
+"""
+activities = {
+RIDER: {},
+DRIVER: {}
+}
+log = self._log
+for index in range(len(log)):
+category = activities[CATEGORIES[log.categories[index]]]
+identifier = log.name(log.ids[index])
+if identifier not in category:
+category[identifier] = []
+category[identifier].append(log[index])
+return activities
+def report(self):
+"""Return a report of the activities that have occurred.
+The statistics are computed in one pass over the rider activities
+and one over the driver activities, in the columns of the log.
+@type self: ColumnarMonitor
+@rtype: dict[str, object]
+>>> m = ColumnarMonitor()
+>>> m.notify(1, RIDER, REQUEST, "Chris", Location(0, 0))
+>>> m.notify(3, RIDER, PICKUP, "Chris", Location(10, 2))
+>>> m.notify(2, RIDER, REQUEST, "Chen", Location(3, 3))
+>>> m.notify(6, RIDER, CANCEL, "Chen", Location(3, 3))
+>>> m.notify(2, DRIVER, REQUEST, "Chen", Location(3, 3))
+>>> m.notify(6, DRIVER, PICKUP, "Chen", Location(4, 0))
+>>> m.notify(10, DRIVER, DROPOFF, "Chen", Location(13, 20))
+>>> report = m.report()
+>>> report["rider_wait_time"], report["driver_ride_distance"]
+(3.0, 29.0)
+"""
+log = self._log
+rider_code = CATEGORIES.index(RIDER)
+pickup_code = DESCRIPTIONS.index(PICKUP)
+wait_times = self._wait_times()
+# The last row and column and whether the last activity was a
+# pickup for each driver, by identifier index.
+driver_rows = {}
+driver_columns = {}
+driver_pickups = set()
+total_distance = 0
+ride_distance = 0
+for category, description, identifier, row, column in zip(
+log.categories, log.descriptions, log.ids, log.rows,
+log.columns):
+if category == rider_code:
+continue
+if identifier in driver_rows:
+distance = abs(column - driver_columns[identifier]) + \
+abs(row - driver_rows[identifier])
+total_distance += distance
+if identifier in driver_pickups:
+ride_distance += distance
+driver_pickups.remove(identifier)
+driver_rows[identifier] = row
+driver_columns[identifier] = column
+if description == pickup_code:
+driver_pickups.add(identifier)
+return {"rider_wait_time": sum(wait_times) / len(wait_times),
+"driver_total_distance": total_distance / len(driver_rows),
+"driver_ride_distance": ride_distance / len(driver_rows)}
+def wait_time_percentiles(self, percents=(50, 95, 99)):
+"""Return the <percents>th percentiles of the wait time of riders
+that have either been picked up or have cancelled their ride, by
+percent.
+The wait times are sorted once for all of the percentiles, which
+takes O(n log n) time for n riders.
+@type self: ColumnarMonitor
+@type percents: tuple[int]
+@rtype: dict[int, int]
+>>> m = ColumnarMonitor()
+>>> m.notify(1, RIDER, REQUEST, "Chris", Location(0, 0))
+>>> m.notify(3, RIDER, PICKUP, "Chris", Location(10, 2))
+>>> m.notify(2, RIDER, REQUEST, "Chen", Location(3, 3))
+>>> m.notify(6, RIDER, CANCEL, "Chen", Location(3, 3))
+>>> m.wait_time_percentiles()
+{50: 2, 95: 4, 99: 4}
+"""
+wait_times = sorted(self._wait_times())
+return {percent: percentile(wait_times, percent)
+for percent in percents}
+def _wait_times(self):
+"""Return the wait time of each rider that has either been picked
+up or has cancelled their ride, in the order they stopped waiting.
+@type self: ColumnarMonitor
+@rtype: list[int]
+"""
+log = self._log
+rider_code = CATEGORIES.index(RIDER)
+# The number of activities and the first time of each rider, by
+# identifier index.
+rider_counts = {}
+rider_starts = {}
+wait_times = []
+for time, category, identifier in zip(log.times, log.categories,
+log.ids):
+if category == rider_code:
+count = rider_counts.get(identifier, 0)
+if count == 0:
+rider_starts[identifier] = time
+elif count == 1:
+wait_times.append(time - rider_starts.pop(identifier))
+rider_counts[identifier] = count + 1
+return wait_times
+def percentile(values, percent):
+"""Return the <percent>th percentile of <values>, using the
+nearest-rank method.
+Precondition: <values> is sorted and not empty.
+@type values: list[int]
+@type percent: int
+@rtype: int
+>>> percentile([1, 2, 3, 4], 50)
+2
+>>> percentile([1, 2, 3, 4], 95)
+4
+"""
+rank = -(-percent * len(values) // 100)
+return values[max(rank, 1) - 1]
+"""Simulation profiling
+A Profiler records where the time of a simulation goes: how many events
+of each class were done and how long they took, how deep the event queue
+was, how many drivers each search for a driver examined, and how many
+activities of each kind the monitor was notified of.
+A Simulation only uses a Profiler when it is given one, so runs without
+one pay nothing for it. The records stay in the Profiler, and its
+summary method returns them once the simulation has run.
+"""
+from time import perf_counter
+class Profiler:
+"""A record of the work done by a simulation.
+=== Attributes ===
+@type sample_interval: int
+The number of events between samples of the queue depth.
+"""
+# === Private Attributes ===
+# @type _counts: dict[str, int]
+# The number of events done, by class name.
+# @type _seconds: dict[str, float]
+# The total time spent doing events, by class name.
+# @type _histograms: dict[str, dict[int, int]]
+# For each class name, the number of events whose time in
+# microseconds was below each power of two and at least the one
+# before it.
+# @type _depths: list[(int, int)]
+# Samples of the timestamp and the number of events in the queue.
+# @type _since_sample: int
+# The number of events done since the last sample of the depth.
+# @type _scans: dict[int, int]
+# The number of searches for a driver that examined each number of
+# drivers, as a histogram like _histograms.
+# @type _scanned: int
+# The total number of drivers examined by searches.
+# @type _searches: int
+# The number of searches for a driver.
+# @type _notifications: dict[str, int]
+# The number of activities the monitor was notified of, by
+# category and description.
+def __init__(self, sample_interval=100):
+"""Initialize an empty Profiler.
+@type self: Profiler
+@type sample_interval: int
+@rtype: None
+"""
+self.sample_interval = sample_interval
+self._counts = {}
+self._seconds = {}
+self._histograms = {}
+self._depths = []
+self._since_sample = 0
+self._scans = {}
+self._scanned = 0
+self._searches = 0
+self._notifications = {}
+def do(self, events, dispatcher, monitor, depth):
+"""Do <events>, which all have the same class and timestamp, with
+its do_all method, record how long they took, and return the events
+they spawned.
+<depth> is the number of events left in the queue.
+@type self: Profiler
+@type events: list[Event]
+@type dispatcher: Dispatcher
+@type monitor: Monitor
+@type depth: int
+@rtype: list[Event]
+"""
+start = perf_counter()
+spawned = type(events[0]).do_all(events, dispatcher, monitor)
+elapsed = perf_counter() - start
+name = type(events[0]).__name__
+count = len(events)
+self._counts[name] = self._counts.get(name, 0) + count
+self._seconds[name] = self._seconds.get(name, 0.0) + elapsed
+histogram = self._histograms.setdefault(name, {})
+bucket = _bucket(elapsed * 1e6 / count)
+histogram[bucket] = histogram.get(bucket, 0) + count
+self._since_sample += count
+if self._since_sample >= self.sample_interval:
+self._since_sample = 0
+self._depths.append((events[0].timestamp, depth))
+return spawned
+def record_scan(self, length):
+"""Record a search for a driver that examined <length> drivers.
+@type self: Profiler
+@type length: int
+@rtype: None
+"""
+self._searches += 1
+self._scanned += length
+bucket = _bucket(length)
+self._scans[bucket] = self._scans.get(bucket, 0) + 1
+def record_notifications(self, category, description, count):
+"""Record that the monitor was notified of <count> activities of
+<category> and <description>.
+@type self: Profiler
+@type category: DRIVER | RIDER
+@type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+@type count: int
+@rtype: None
+"""
+key = "{} {}".format(category, description)
+self._notifications[key] = self._notifications.get(key, 0) + count
+def summary(self):
+"""Return a summary of the records of this Profiler.
+Histograms map a power of two to the number of measurements below
+it, and at least the power of two before it; times are in
+microseconds.
+@type self: Profiler
+@rtype: dict[str, object]
+>>> profiler = Profiler()
+>>> profiler.record_scan(3)
+>>> profiler.record_scan(12)
+>>> profiler.record_notifications("rider", "request", 2)
+>>> summary = profiler.summary()
+>>> summary["scans"]
+{'searches': 2, 'drivers': 15, 'histogram': {4: 1, 16: 1}}
+>>> summary["notifications"]
+{'rider request': 2}
+"""
+events = {}
+for name in self._counts:
+events[name] = {"count": self._counts[name],
+"seconds": self._seconds[name],
+"histogram": dict(sorted(
+self._histograms[name].items()))}
+return {"events": events,
+"queue_depth": list(self._depths),
+"scans": {"searches": self._searches,
+"drivers": self._scanned,
+"histogram": dict(sorted(self._scans.items()))},
+"notifications": dict(self._notifications)}
+class ProfiledDispatcher:
+"""A wrapper around a Dispatcher that records the length of each
+search for a driver in a Profiler, both when a driver is requested for
+one rider and for each rider of a batch.
+"""
+# === Private Attributes ===
+# @type _dispatcher: Dispatcher
+# The wrapped dispatcher.
+# @type _profiler: Profiler
+# The profiler that records the searches.
+def __init__(self, dispatcher, profiler):
+"""Initialize a ProfiledDispatcher.
+@type self: ProfiledDispatcher
+@type dispatcher: Dispatcher
+@type profiler: Profiler
+@rtype: None
+"""
+self._dispatcher = dispatcher
+self._profiler = profiler
+def __getattr__(self, attribute):
+"""Return the attribute of the wrapped dispatcher.
+@type self: ProfiledDispatcher
+@type attribute: str
+@rtype: object
+"""
+return getattr(self._dispatcher, attribute)
+def request_driver(self, rider):
+"""Return a driver for the rider, as Dispatcher.request_driver
+does, recording the length of the search.
+@type self: ProfiledDispatcher
+@type rider: Rider
+@rtype: Driver | None
+"""
+driver = self._dispatcher.request_driver(rider)
+if driver is not None:
+self._profiler.record_scan(self._dispatcher.last_scan_length())
+return driver
+def match_batch(self):
+"""Match the riders of the current batch, as Dispatcher.match_batch
+does, recording the length of the search for each of them.
+@type self: ProfiledDispatcher
+@rtype: list[(Rider, Driver)]
+>>> from dispatcher import Dispatcher
+>>> from driver import Driver
+>>> from rider import Rider
+>>> from location import Location
+>>> dispatcher = Dispatcher(window=5)
+>>> dispatcher.available_drivers = [Driver("A", Location(0, 0), 1)]
+>>> profiler = Profiler()
+>>> dis = ProfiledDispatcher(dispatcher, profiler)
+>>> dis.add_to_batch(Rider("X", Location(0, 3), Location(9, 9), 9))
+>>> dis.add_to_batch(Rider("Y", Location(0, 5), Location(9, 9), 9))
+>>> len(dis.match_batch())
+1
+>>> profiler.summary()["scans"]["searches"]
+2
+"""
+pairs = self._dispatcher.match_batch()
+for length in self._dispatcher.batch_scan_lengths():
+self._profiler.record_scan(length)
+return pairs
+class ProfiledMonitor:
+"""A wrapper around a monitor that counts its notifications in a
+Profiler.
+"""
+# === Private Attributes ===
+# @type _monitor: Monitor
+# The wrapped monitor.
+# @type _profiler: Profiler
+# The profiler that counts the notifications.
+def __init__(self, monitor, profiler):
+"""Initialize a ProfiledMonitor.
+@type self: ProfiledMonitor
+@type monitor: Monitor
+@type profiler: Profiler
+@rtype: None
+"""
+self._monitor = monitor
+self._profiler = profiler
+def __getattr__(self, attribute):
+"""Return the attribute of the wrapped monitor.
+@type self: ProfiledMonitor
+@type attribute: str
+@rtype: object
+"""
+return getattr(self._monitor, attribute)
+def notify(self, timestamp, category, description, identifier,
+location):
+"""Notify the wrapped monitor of the activity, and count it.
+@type self: ProfiledMonitor
+@type timestamp: int
+@type category: DRIVER | RIDER
+@type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+@type identifier: str
+@type location: Location
+@rtype: None
+"""
+self._profiler.record_notifications(category, description, 1)
+self._monitor.notify(timestamp, category, description, identifier,
+location)
+def notify_all(self, timestamp, category, description, identifiers,
+locations):
+"""Notify the wrapped monitor of the activities, and count them.
+@type self: ProfiledMonitor
+@type timestamp: int
+@type category: DRIVER | RIDER
+@type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+@type identifiers: list[str]
+@type locations: list[Location]
+@rtype: None
+"""
+self._profiler.record_notifications(category, description,
+len(identifiers))
+self._monitor.notify_all(timestamp, category, description,
+identifiers, locations)
+def _bucket(value):
+"""Return the smallest power of two greater than <value>, or 1 if
+<value> is less than 1.
+@type value: float
+@rtype: int
+>>> _bucket(0.4), _bucket(1), _bucket(5.5), _bucket(8)
+(1, 2, 8, 16)
+"""
+return 1 << int(value).bit_length()
+"""Monte Carlo replication
+Replications run the simulation many times on random workloads, and
+estimate the mean of each field of the report with a confidence interval.
+Replication number i of a run always uses stream i of its seed, so runs
+are reproducible. Every configuration being compared is run on the same
+workload for the same replication number, so that differences between
+configurations are not hidden by differences between workloads (common
+random numbers).
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import atan, cos, pi, sin, sqrt
+from statistics import NormalDist, mean, stdev
+from monitor import AggregateMonitor
+from simulation import Simulation
+from workload import seeded_stream, generate_events
+def t_quantile(probability, degrees):
+"""Return the <probability> quantile of Student's t distribution with
+<degrees> degrees of freedom.
+For 5 or more degrees of freedom, this is a Cornish-Fisher expansion
+around the normal quantile, which is accurate to about 0.01. For fewer,
+where the expansion is not accurate, the distribution is inverted
+exactly by bisection.
+@type probability: float
+@type degrees: int
+@rtype: float
+>>> round(t_quantile(0.975, 1), 3), round(t_quantile(0.975, 2), 3)
+(12.706, 4.303)
+>>> round(t_quantile(0.975, 3), 3), round(t_quantile(0.975, 4), 3)
+(3.182, 2.776)
+>>> round(t_quantile(0.025, 4), 3), round(t_quantile(0.975, 30), 2)
+(-2.776, 2.04)
+"""
+if degrees < 5:
+if probability < 0.5:
+return -t_quantile(1 - probability, degrees)
+low, high = 0.0, 1.0
+while _t_distribution(high, degrees) < probability:
+low, high = high, 2 * high
+for _ in range(100):
+middle = (low + high) / 2
+if _t_distribution(middle, degrees) < probability:
+low = middle
+else:
+high = middle
+return (low + high) / 2
+z = NormalDist().inv_cdf(probability)
+return (z + (z ** 3 + z) / (4 * degrees) +
+(5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * degrees ** 2) +
+(3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) /
+(384 * degrees ** 3))
+def _t_distribution(t, degrees):
+"""Return the probability that a variable with Student's t
+distribution with <degrees> degrees of freedom is at most <t>.
+This is the finite series for a whole number of degrees of freedom,
+in Abramowitz and Stegun 26.7.3 and 26.7.4.
+@type t: float
+@type degrees: int
+@rtype: float
+>>> _t_distribution(0.0, 3), round(_t_distribution(1.0, 1), 3)
+(0.5, 0.75)
+"""
+theta = atan(t / sqrt(degrees))
+square = cos(theta) ** 2
+if degrees % 2 == 1:
+term, total = 1.0, 0.0
+for k in range(1, (degrees - 1) // 2 + 1):
+total += term
+term *= square * 2 * k / (2 * k + 1)
+area = 2 / pi * (theta + sin(theta) * cos(theta) * total)
+else:
+term, total = 1.0, 0.0
+for k in range(1, degrees // 2 + 1):
+total += term
+term *= square * (2 * k - 1) / (2 * k)
+area = sin(theta) * total
+return (1 + area) / 2
+def confidence_interval(values, confidence=0.95):
+"""Return the mean of <values> and the half width of its confidence
+interval.
+Precondition: len(values) >= 2.
+@type values: list[float]
+@type confidence: float
+@rtype: (float, float)
+>>> center, half_width = confidence_interval([1.0, 2.0, 3.0, 4.0, 5.0])
+>>> center, round(half_width, 2)
+(3.0, 1.96)
+"""
+degrees = len(values) - 1
+quantile = t_quantile(1 - (1 - confidence) / 2, degrees)
+return mean(values), quantile * stdev(values) / sqrt(len(values))
+def replicate(configurations, workload=None, seed=0, workers=None,
+min_replications=5, max_replications=100, target=None,
+field="rider_wait_time", confidence=0.95):
+"""Run replications of each configuration in <configurations> until
+the confidence interval of <field> is narrower than <target> for all of
+them, or <max_replications> have been run, and return the estimates.
+<configurations> maps a name to the options of the Simulation for that
+configuration. <workload> has the options of generate_events.
+Replications are run in rounds of <workers> at a time, in a pool of
+processes.
+The result maps each name to a dict with the number of replications
+under "replications", and the mean and half width of the confidence
+interval of each numeric field of the report. Other fields are left
+out.
+Raise a ValueError if <min_replications> is less than 2, since a
+confidence interval needs at least two replications.
+@type configurations: dict[str, dict[str, object]]
+@type workload: dict[str, object] | None
+@type seed: int
+@type workers: int | None
+The number of processes, or None for one per processor.
+@type min_replications: int
+@type max_replications: int
+@type target: float | None
+The largest acceptable half width, or None to run
+<max_replications>.
+@type field: str
+@type confidence: float
+@rtype: dict[str, dict[str, object]]
+>>> estimates = replicate({"greedy": {}},
+...                       {"num_riders": 20}, workers=1,
+...                       max_replications=3, min_replications=3)
+>>> sorted(estimates["greedy"])  # doctest: +NORMALIZE_WHITESPACE
+['driver_ride_distance', 'driver_total_distance', 'replications',
+'rider_wait_time']
+"""
+if min_replications < 2:
+raise ValueError("at least 2 replications are needed")
+if workload is None:
+workload = {}
+if "fork" in multiprocessing.get_all_start_methods():
+context = multiprocessing.get_context("fork")
+else:
+context = None
+if workers is None:
+workers = os.cpu_count() or 1
+reports = {name: [] for name in configurations}
+with ProcessPoolExecutor(workers, mp_context=context) as executor:
+count = 0
+while count < max_replications:
+number = min(max(workers, min_replications - count),
+max_replications - count)
+tasks = [(name, options, workload, seed, replication)
+for replication in range(count, count + number)
+for name, options in configurations.items()]
+for (name, _, _, _, _), report in zip(
+tasks, executor.map(_run_replication, tasks)):
+reports[name].append(report)
+count += number
+if target is not None and count >= min_replications and \
+all(confidence_interval(
+[report[field] for report in runs],
+confidence)[1] < target
+for runs in reports.values()):
+break
+estimates = {}
+for name, runs in reports.items():
+estimates[name] = {"replications": len(runs)}
+for key, value in runs[0].items():
+if not isinstance(value, (int, float)):
+continue
+estimates[name][key] = confidence_interval(
+[report[key] for report in runs], confidence)
+return estimates
+def _run_replication(task):
+"""Run one replication and return its report.
+<task> is the configuration name, its Simulation options, the workload
+options, the seed and the replication number.
+@type task: (str, dict[str, object], dict[str, object], int, int)
+@rtype: dict[str, object]
+"""
+name, options, workload, seed, replication = task
+events = generate_events(seeded_stream(seed, replication), **workload)
+return Simulation(**options).run(events)
+if __name__ == "__main__":
+estimates = replicate(
+{"greedy": {"monitor_class": AggregateMonitor, "compact": True},
+"batched": {"monitor_class": AggregateMonitor, "compact": True,
+"window": 2}},
+target=0.05)
+for name, estimate in estimates.items():
+print(name, estimate)
 from location import Location
 """
 The rider module contains the Rider class. It also contains
@@ -1162,10 +5852,14 @@ self.patience == other.patience)
 if __name__ == "__main__":
 import doctest
 doctest.testmod()
+from itertools import islice
 from container import PriorityQueue
-from dispatcher import Dispatcher
-from event import create_event_list
+from dispatcher import Dispatcher, DriverGrid
+from event import create_event_list, next_incoming, EVENT_ORDER
 from monitor import Monitor
+from compact import EventLoop
+from profiler import ProfiledDispatcher, ProfiledMonitor
+from checkpoint import load_checkpoint
 class Simulation:
 """A simulation.
 This is the class which is responsible for setting up and running a
@@ -1190,40 +5884,608 @@ event
 # sorting order.
 # @type _dispatcher: Dispatcher
 # The dispatcher associated with the simulation.
-def __init__(self):
+# @type _incoming: iterator[Event]
+# The initial events that have not been taken yet, after
+# _next_event.
+# @type _next_event: Event | None
+# The next initial event, or None if there are no more.
+# @type _consumed: int
+# The number of initial events that have been taken.
+def __init__(self, queue_class=PriorityQueue, monitor_class=Monitor,
+index_class=DriverGrid, window=0, group_events=False,
+compact=False, profiler=None, memory=None, checkpoint=None,
+resume=None):
 """Initialize a Simulation.
 @type self: Simulation
+@type queue_class: type
+The Container used for the event queue, either PriorityQueue
+or CalendarQueue.
+@type monitor_class: type
+The monitor that records activities: Monitor, AggregateMonitor
+or ColumnarMonitor.
+@type index_class: type
+The index used to find the nearest available driver, either
+DriverGrid or DriverArray.
+@type window: int
+The batching window of the dispatcher, or 0 to assign a driver
+to each rider as soon as they request one.
+@type group_events: bool
+If True, all of the events at each timestamp are done together,
+grouped by class in the order of EVENT_ORDER, instead of one at
+a time.
+@type compact: bool
+If True, events are run as compact tuples by an EventLoop,
+which gives the same results faster; queue_class and
+group_events are then not used.
+@type profiler: Profiler | None
+A profiler that records the work done by run(), which can then
+be read with its summary method. With compact, only the
+dispatcher and the monitor are profiled.
+@type memory: MemorySampler | None
+A sampler of the memory used by the components of the
+simulation, whose samples can then be read from it. With
+compact, only a final sample is taken, without the event queue.
+@type checkpoint: Checkpointer | None
+A checkpointer that saves the state of the simulation at
+regular intervals of simulation time while run() is running.
+Checkpoints cannot be used with compact.
+@type resume: str | None
+The name of a checkpoint file to resume from: run() restores
+the state saved in it, skips the initial events that had already
+been taken, and carries on. The other options must be the same
+as those of the simulation that saved the checkpoint.
 @rtype: None
 """
-self._events = PriorityQueue()
-self._dispatcher = Dispatcher()
-self._monitor = Monitor()
+if compact and (checkpoint is not None or resume is not None):
+raise ValueError("checkpoints cannot be used with compact")
+self._events = queue_class()
+self._dispatcher = Dispatcher(index_class, window)
+self._monitor = monitor_class()
+self._group_events = group_events
+self._compact = compact
+self._profiler = profiler
+self._memory = memory
+self._checkpoint = checkpoint
+self._resume = resume
+self._incoming = iter([])
+self._next_event = None
+self._consumed = 0
+if profiler is not None:
+self._dispatcher = ProfiledDispatcher(self._dispatcher, profiler)
+self._monitor = ProfiledMonitor(self._monitor, profiler)
 def run(self, initial_events):
 """Run the simulation on the list of events in <initial_events>.
 Return a dictionary containing statistics of the simulation,
 according to the specifications in the assignment handout.
+<initial_events> may also be an iterator, such as the one returned
+by read_events. Its events are then pulled one at a time, when the
+simulation reaches their timestamp, so they never all have to be in
+memory at once.
+If <initial_events> is not a list, its events must be sorted by
+timestamp; a ValueError is raised when one is found to be earlier
+than the event before it. A list can be in any order.
 @type self: Simulation
-@type initial_events: list[Event]
+@type initial_events: list[Event] | iterator[Event]
 An initial list of events.
 @rtype: dict[str, object]
+>>> from monitor import AggregateMonitor, ColumnarMonitor
+>>> from workload import seeded_stream, generate_events
+>>> def compare(**options):
+...     reports = [Simulation(compact=compact, **options).run(
+...         generate_events(seeded_stream(3, 0), num_riders=500))
+...         for compact in (False, True)]
+...     return reports[0] == reports[1]
+>>> [compare(window=window, monitor_class=monitor_class)
+...  for window in (0, 2)
+...  for monitor_class in (Monitor, AggregateMonitor, ColumnarMonitor)]
+[True, True, True, True, True, True]
 """
+if self._compact:
+EventLoop(self._dispatcher, self._monitor).run(initial_events)
+return self._report()
+self._start(initial_events)
+self._advance()
+return self._report()
+def _start(self, initial_events):
+"""Restore the checkpoint to resume from, if there is one, and
+prepare to take the events in <initial_events>, as described in
+run().
+@type self: Simulation
+@type initial_events: list[Event] | iterator[Event]
+@rtype: None
+"""
+self._consumed = 0
+if self._resume is not None:
+self._consumed = load_checkpoint(
+self._resume, self._events, self._dispatcher,
+self._monitor)[1]
+initial_events = islice(initial_events, self._consumed, None)
 # Add all initial events to the event queue.
-for event in initial_events:
-self._events.add(event)
-while self._events.is_empty() is False:
+if isinstance(initial_events, list):
+self._events.add_all(initial_events)
+self._consumed = len(initial_events)
+initial_events = []
+self._incoming = iter(initial_events)
+self._next_event = next(self._incoming, None)
+def _advance(self, until=None):
+"""Do events in order until there are none left, or until the next
+event is at or after <until>.
+@type self: Simulation
+@type until: int | None
+The time to stop at, or None to do every event.
+@rtype: None
+"""
+incoming = self._incoming
+next_event = self._next_event
+consumed = self._consumed
+while next_event is not None or self._events.is_empty() is False:
+# An incoming event goes before queued events with the same
+# timestamp, as if it had been added to the queue first.
+if next_event is not None and (
+self._events.is_empty() or
+next_event.timestamp <= self._events.peek().timestamp):
+if until is not None and next_event.timestamp >= until:
+break
+executed_event = next_event
+next_event = next_incoming(incoming, executed_event)
+consumed += 1
+else:
+if until is not None and \
+self._events.peek().timestamp >= until:
+break
 executed_event = self._events.remove()
+if self._group_events:
+# Take every other event with the same timestamp, from the
+# incoming events and then from the queue.
+timestamp = executed_event.timestamp
+tick = [executed_event]
+while next_event is not None and \
+next_event.timestamp == timestamp:
+tick.append(next_event)
+next_event = next_incoming(incoming, next_event)
+consumed += 1
+while not self._events.is_empty() and \
+self._events.peek().timestamp == timestamp:
+tick.append(self._events.remove())
+result_events = self._do_all(tick)
+elif self._profiler is None:
 result_events = executed_event.do(self._dispatcher,
 self._monitor)
+else:
+result_events = self._profiler.do(
+[executed_event], self._dispatcher, self._monitor,
+len(self._events))
 # this warning can be ignored
 if result_events is not None:
 for result_event in result_events:
-self._events.add(result_event)
+result_event.handle = \
+self._events.schedule(result_event)
+if self._memory is not None:
+self._memory.observe(executed_event.timestamp, self._events,
+self._dispatcher, self._monitor)
+if self._checkpoint is not None:
+self._checkpoint.observe(executed_event.timestamp, consumed,
+self._events, self._dispatcher,
+self._monitor)
 # Until there are no more events, remove an event
 # from the event queue and do it. Add any returned
 # events to the event queue.
-return self._monitor.report()
+self._next_event = next_event
+self._consumed = consumed
+def _report(self):
+"""Return the report of the monitor, after the final sample of the
+memory sampler if there is one.
+@type self: Simulation
+@rtype: dict[str, object]
+"""
+report = self._monitor.report()
+if self._memory is not None:
+if self._compact:
+queue = None
+else:
+queue = self._events
+self._memory.finish(queue, self._dispatcher, self._monitor)
+return report
+def _do_all(self, events):
+"""Do all of <events>, which have the same timestamp, and return
+the list of new events they spawned.
+The events are grouped by class, and each group is done with the
+do_all method of its class. Groups are done in the order of
+EVENT_ORDER, followed by any other classes in the order they first
+appear; within a group, events keep their order in <events>.
+Events spawned with the same timestamp are done in a later group.
+@type self: Simulation
+@type events: list[Event]
+@rtype: list[Event]
+>>> from driver import Driver
+>>> from rider import Rider
+>>> from location import Location
+>>> from event import RiderRequest, DriverRequest
+>>> rider = Rider("R", Location(1, 1), Location(5, 5), 10)
+>>> driver = Driver("D", Location(0, 0), 1)
+>>> simulation = Simulation(group_events=True)
+>>> [type(event).__name__ for event in simulation._do_all(
+...     [RiderRequest(0, rider), DriverRequest(0, driver)])]
+['Pickup', 'Cancellation']
+>>> simulation = Simulation(group_events=True)
+>>> simulation.run(create_event_list("events.txt"))
+... # doctest: +NORMALIZE_WHITESPACE
+{'rider_wait_time': 0.2857142857142857,
+'driver_total_distance': 5.714285714285714,
+'driver_ride_distance': 5.142857142857143}
+"""
+groups = {}
+for event in events:
+groups.setdefault(type(event), []).append(event)
+order = sorted(groups, key=lambda cls: EVENT_ORDER.index(cls)
+if cls in EVENT_ORDER else len(EVENT_ORDER))
+spawned = []
+for cls in order:
+if self._profiler is None:
+spawned.extend(cls.do_all(groups[cls], self._dispatcher,
+self._monitor))
+else:
+spawned.extend(self._profiler.do(
+groups[cls], self._dispatcher, self._monitor,
+len(self._events)))
+return spawned
 if __name__ == "__main__":
 events = create_event_list("events.txt")
 sim = Simulation()
 final_stats = sim.run(events)
-print(final_stats)
\ No newline at end of file
+print(final_stats)
+"""Parameter sweeps
+A sweep runs the same scenario once for every combination of parameters
+in a grid, spreading the runs over a pool of processes, and collects the
+report of each run into one table.
+The scenario is parsed once, in the parent process. Where processes can
+be forked, the workers inherit the parsed scenario instead of receiving
+a pickled copy with every run.
+=== Constants ===
+@type PARAMETERS: dict[str, object]
+The parameters that can be swept, and their default values:
+num_drivers, the number of drivers, taken in file order (None for
+all of them); patience, a factor applied to the patience of every
+rider; and speed, a factor applied to the speed of every driver.
+Scaled patiences and speeds are rounded, and are at least 1.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from driver import Driver
+from rider import Rider
+from location import Location
+from event import DriverRequest, RiderRequest, create_event_list
+from monitor import AggregateMonitor
+from simulation import Simulation
+PARAMETERS = {"num_drivers": None, "patience": 1, "speed": 1}
+# The scenario and Simulation options of the sweep in this process, set by
+# _load_scenario.
+_sweep = None
+def parameter_grid(grid):
+"""Return every combination of the values in <grid>, which maps
+parameter names to lists of values.
+@type grid: dict[str, list]
+@rtype: list[dict[str, object]]
+>>> parameter_grid({"patience": [1, 2], "speed": [1]})
+[{'patience': 1, 'speed': 1}, {'patience': 2, 'speed': 1}]
+"""
+names = list(grid)
+for name in names:
+if name not in PARAMETERS:
+raise ValueError("unknown parameter {}".format(name))
+return [dict(zip(names, values))
+for values in product(*[grid[name] for name in names])]
+def parse_scenario(filename):
+"""Return the events in <filename> as plain tuples, from which fresh
+events can be built for each run.
+Each tuple is (timestamp, event class, id, origin, destination, value),
+where destination is None for a DriverRequest and value is the speed
+of a driver or the patience of a rider.
+@type filename: str
+@rtype: list[tuple]
+"""
+scenario = []
+for event in create_event_list(filename):
+if isinstance(event, DriverRequest):
+driver = event.driver
+scenario.append((event.timestamp, DriverRequest, driver.id,
+driver.location, None, driver.speed))
+else:
+rider = event.rider
+scenario.append((event.timestamp, RiderRequest, rider.id,
+rider.origin, rider.destination,
+rider.patience))
+return scenario
+def build_events(scenario, num_drivers=None, patience=1, speed=1):
+"""Return a new list of events for <scenario>, with the parameters
+described in PARAMETERS.
+@type scenario: list[tuple]
+@type num_drivers: int | None
+@type patience: float
+@type speed: float
+@rtype: list[Event]
+>>> scenario = [(0, DriverRequest, "A", Location(0, 0), None, 2),
+...             (0, DriverRequest, "B", Location(1, 1), None, 2),
+...             (3, RiderRequest, "C", Location(0, 0), Location(4, 4),
+...              10)]
+>>> events = build_events(scenario, num_drivers=1, patience=1.5)
+>>> [str(event) for event in events]
+['0 -- A 0,0 2: Request a rider', '3 -- C 0,0 4,4 15: Request a driver']
+>>> events[1].rider.patience
+15
+>>> build_events(scenario, speed=1.6)[0].driver.speed
+3
+>>> build_events(scenario, speed=0.1)[0].driver.speed
+1
+>>> build_events(scenario, patience=0.01)[2].rider.patience
+1
+"""
+events = []
+drivers = 0
+for timestamp, kind, identifier, origin, destination, value in \
+scenario:
+if kind is DriverRequest:
+if num_drivers is not None and drivers == num_drivers:
+continue
+drivers += 1
+events.append(DriverRequest(
+timestamp, Driver(identifier, origin,
+max(1, round(value * speed)))))
+else:
+events.append(RiderRequest(
+timestamp, Rider(identifier, origin, destination,
+max(1, round(value * patience)))))
+return events
+def run_sweep(filename, grid, workers=None, **options):
+"""Run the scenario in <filename> once for each combination of the
+parameters in <grid>, using <workers> processes, and return one row
+per run: its parameters followed by its report.
+<options> are passed to each Simulation.
+@type filename: str
+@type grid: dict[str, list]
+@type workers: int | None
+The number of processes, or None for one per processor.
+@rtype: list[dict[str, object]]
+>>> from dispatcher import DriverArray
+>>> rows = run_sweep("events.txt", {"speed": [0.5, 1.5]}, workers=1,
+...                  index_class=DriverArray)
+>>> [(row["speed"], row["rider_wait_time"] > 0) for row in rows]
+[(0.5, True), (1.5, True)]
+"""
+scenario = parse_scenario(filename)
+combinations = parameter_grid(grid)
+if "fork" in multiprocessing.get_all_start_methods():
+context = multiprocessing.get_context("fork")
+else:
+context = None
+# With fork, the initializer's arguments are inherited by the workers
+# rather than pickled.
+with ProcessPoolExecutor(workers, mp_context=context,
+initializer=_load_scenario,
+initargs=(scenario, options)) as executor:
+reports = executor.map(_run, combinations)
+return [dict(parameters, **report)
+for parameters, report in zip(combinations, reports)]
+def format_table(rows):
+"""Return <rows>, as returned by run_sweep, as a table of text.
+@type rows: list[dict[str, object]]
+@rtype: str
+>>> print(format_table([{"speed": 1, "rider_wait_time": 0.5},
+...                     {"speed": 2, "rider_wait_time": 0.25}]))
+speed rider_wait_time
+1             0.5
+2            0.25
+"""
+if len(rows) == 0:
+return ""
+names = list(rows[0])
+cells = [names] + [[_format_cell(row[name]) for name in names]
+for row in rows]
+widths = [max(len(line[i]) for line in cells)
+for i in range(len(names))]
+return "\n".join(" ".join(cell.rjust(width)
+for cell, width in zip(line, widths))
+for line in cells)
+def _format_cell(value):
+"""Return <value> as a cell of a table.
+@type value: object
+@rtype: str
+"""
+if isinstance(value, float):
+return "{:.6g}".format(value)
+return str(value)
+def _load_scenario(scenario, options):
+"""Set the scenario and Simulation options of the sweep in this
+process.
+@type scenario: list[tuple]
+@type options: dict[str, object]
+@rtype: None
+"""
+global _sweep
+_sweep = (scenario, options)
+def _run(parameters):
+"""Run the scenario of this process with <parameters>, and return the
+report.
+@type parameters: dict[str, object]
+@rtype: dict[str, object]
+"""
+scenario, options = _sweep
+events = build_events(scenario, **parameters)
+return Simulation(**options).run(events)
+if __name__ == "__main__":
+print(format_table(run_sweep(
+"events.txt",
+{"num_drivers": [1, 2, None], "patience": [0.5, 1, 2],
+"speed": [1, 2]},
+monitor_class=AggregateMonitor, compact=True)))
+"""Workload generation
+Random scenarios for the simulation, generated from a seeded random
+number generator, so that the same seed always gives the same events.
+stream_events generates large scenarios one event at a time, so that
+millions of events can be produced, written to a file or run directly in
+bounded memory.
+=== Constants ===
+@type DEMAND_CURVE: tuple[float]
+The default demand for each hour of the day, relative to the peak:
+low at night, with peaks in the morning and evening rush hours.
+"""
+from random import Random
+from driver import Driver
+from rider import Rider
+from location import Location
+from event import DriverRequest, RiderRequest
+DEMAND_CURVE = (0.15, 0.1, 0.08, 0.08, 0.1, 0.2, 0.45, 0.85, 1.0, 0.75,
+0.55, 0.55, 0.6, 0.55, 0.5, 0.55, 0.7, 0.9, 0.95, 0.75,
+0.55, 0.45, 0.35, 0.25)
+def seeded_stream(seed, stream):
+"""Return the random number generator for stream number <stream> of
+<seed>.
+Different streams of the same seed are independent of each other, and
+each stream is the same every time it is created.
+@type seed: int
+@type stream: int
+@rtype: Random
+>>> seeded_stream(1, 2).random() == seeded_stream(1, 2).random()
+True
+>>> seeded_stream(1, 2).random() == seeded_stream(1, 3).random()
+False
+"""
+return Random("{}:{}".format(seed, stream))
+def generate_events(rng, num_drivers=20, num_riders=200, size=30,
+max_gap=2, max_speed=4, max_patience=30):
+"""Return a list of events for a random scenario, sorted by timestamp.
+All of the drivers request a rider at time 0, from random locations on
+a <size> by <size> grid. Riders then request drivers one after
+another, up to <max_gap> time units apart, to go between random
+locations.
+@type rng: Random
+@type num_drivers: int
+@type num_riders: int
+@type size: int
+@type max_gap: int
+@type max_speed: int
+@type max_patience: int
+@rtype: list[Event]
+>>> events = generate_events(Random(0), 2, 3)
+>>> len(events), events[0].timestamp, events[-1].timestamp >= 0
+(5, 0, True)
+"""
+events = []
+for i in range(num_drivers):
+events.append(DriverRequest(0, Driver(
+"D{}".format(i), _random_location(rng, size),
+rng.randint(1, max_speed))))
+timestamp = 0
+for i in range(num_riders):
+timestamp += rng.randint(0, max_gap)
+events.append(RiderRequest(timestamp, Rider(
+"R{}".format(i), _random_location(rng, size),
+_random_location(rng, size), rng.randint(1, max_patience))))
+return events
+def stream_events(rng, num_drivers=1000, duration=1440, rate=10.0,
+demand=DEMAND_CURVE, day_length=1440, hotspots=(),
+size=100, max_speed=4, max_patience=30):
+"""Yield the events of a random scenario one at a time, sorted by
+timestamp.
+All of the drivers request a rider at time 0. Riders then request
+drivers until <duration>, arriving as a Poisson process whose rate at
+each time is <rate> times the demand for that time of day: <demand>
+has the demand for equal parts of a day of <day_length> time units.
+Origins and destinations are drawn from <hotspots>, a sequence of
+(row, column, weight, spread) tuples, each the centre of a normal
+distribution of locations with standard deviation <spread>, chosen in
+proportion to <weight>. The rest of the grid has weight 1 and is
+uniform.
+@type rng: Random
+@type num_drivers: int
+@type duration: int
+@type rate: float
+The peak number of rider requests per time unit.
+@type demand: tuple[float]
+@type day_length: int
+@type hotspots: tuple[(int, int, float, float)]
+@type size: int
+@type max_speed: int
+@type max_patience: int
+@rtype: iterator[Event]
+>>> events = list(stream_events(Random(0), 10, 100, 2.0,
+...                             hotspots=[(50, 50, 4, 5)]))
+>>> sum(isinstance(event, DriverRequest) for event in events)
+10
+>>> timestamps = [event.timestamp for event in events]
+>>> timestamps == sorted(timestamps) and timestamps[-1] < 100
+True
+"""
+weights = [1] + [hotspot[2] for hotspot in hotspots]
+for i in range(num_drivers):
+yield DriverRequest(0, Driver(
+"D{}".format(i),
+_hotspot_location(rng, size, hotspots, weights),
+rng.randint(1, max_speed)))
+# Arrivals of the peak rate are thinned to the demand at their time.
+peak = max(demand)
+time = 0.0
+count = 0
+while True:
+time += rng.expovariate(rate)
+if time >= duration:
+break
+hour = int(time % day_length * len(demand) / day_length)
+if rng.random() * peak < demand[hour]:
+yield RiderRequest(int(time), Rider(
+"R{}".format(count),
+_hotspot_location(rng, size, hotspots, weights),
+_hotspot_location(rng, size, hotspots, weights),
+rng.randint(1, max_patience)))
+count += 1
+def write_events(events, filename):
+"""Write <events>, DriverRequests and RiderRequests, to <filename> in
+the format read by create_event_list, one at a time.
+@type events: iterator[Event]
+@type filename: str
+@rtype: None
+"""
+with open(filename, "w") as file:
+for event in events:
+if isinstance(event, DriverRequest):
+driver = event.driver
+file.write("{} DriverRequest {} {} {}\n".format(
+event.timestamp, driver.id, driver.location,
+driver.speed))
+else:
+rider = event.rider
+file.write("{} RiderRequest {} {} {} {}\n".format(
+event.timestamp, rider.id, rider.origin,
+rider.destination, rider.patience))
+def _hotspot_location(rng, size, hotspots, weights):
+"""Return a random location on a <size> by <size> grid, near one of
+<hotspots> or anywhere, with the probabilities given by <weights>.
+@type rng: Random
+@type size: int
+@type hotspots: tuple[(int, int, float, float)]
+@type weights: list[float]
+@rtype: Location
+"""
+if len(weights) == 1:
+return _random_location(rng, size)
+choice = rng.choices(range(len(weights)), weights)[0]
+if choice == 0:
+return _random_location(rng, size)
+row, column, _, spread = hotspots[choice - 1]
+return Location(_clamp(round(rng.gauss(row, spread)), size),
+_clamp(round(rng.gauss(column, spread)), size))
+def _clamp(value, size):
+"""Return <value>, moved onto a grid of <size> blocks if it is off it.
+@type value: int
+@type size: int
+@rtype: int
+"""
+return min(max(value, 0), size - 1)
+def _random_location(rng, size):
+"""Return a random location on a <size> by <size> grid.
+@type rng: Random
+@type size: int
+@rtype: Location
+"""
+return Location(rng.randrange(size), rng.randrange(size))
\ No newline at end of file